@@ -1,4 +1,4 @@
-import {rsaEncText, rsaSign, getPublicKey} from "./security.js"
+import {rsaEncText, rsaSign, getPublicKey, verifyResponse} from "./security.js"
 
 const serverAddress = "http://127.0.0.1:8000";
 
@@ -27,7 +27,17 @@ async function getData(request){
     return data;
 }
 
+// Random hex nonce so a captured signed request cannot be replayed
+function newNonce(){
+    const bytes = new Uint8Array(16);
+    crypto.getRandomValues(bytes);
+    return Array.from(bytes, (b) => b.toString(16).padStart(2, "0")).join("");
+}
+
 async function sendRequest(file="", method, body, token=null, signature=true){
+    if (signature && method != "GET"){
+        body = {...body, "nonce": newNonce(), "issued_at": Math.floor(Date.now() / 1000)};
+    }
     let stringBody = JSON.stringify(body);
     let requestParam = null
     if (method == "GET"){
@@ -143,6 +153,16 @@ export async function bidRequest(auctionId, price){
     return data;
 }
 
+// Several bids in one signed request: bids = [{auction_id, price}, ...]
+export async function bidBatchRequest(bids){
+    if (getServerKey() == null) await publicKeyRequest();
+    const req = sendRequest("/bids/batch", "POST", {
+        "bids": bids.map((bid) => ({"auction_id": bid.auction_id, "price": bid.price}))
+    }, getToken());
+    let data = await getData(req);
+    return data;
+}
+
 // Cancel bid request
 export async function cancelBidRequest(bidId){
     if (getServerKey() == null) await publicKeyRequest();
@@ -162,10 +182,66 @@ export async function updatePriceRequest(id){
 }
 
 
-// Get list auction request
+// Price stream (Server-Sent Events): onPrice receives each raw signed envelope
+export function priceStream(ids, onPrice){
+    const url = serverAddress + "/price-stream?auction_ids=" + ids.join(",")
+        + "&token=" + encodeURIComponent(getToken());
+    const source = new EventSource(url);
+    source.addEventListener("price", (event) => onPrice(event.data));
+    return source;
+}
+
+
+// Bid history (NDJSON): onBids receives each chunk of bids, newest first.
+// The last line is a signed summary holding the SHA-256 of every line before
+// it; resolves with that summary, rejects on a bad signature, a digest
+// mismatch or a truncated stream.
+export async function bidHistoryRequest(auctionId, onBids){
+    if (getServerKey() == null) await publicKeyRequest();
+    const response = await sendRequest("/bid-history", "POST", {"auction_id": auctionId}, getToken());
+    if (!response.ok) throw new Error(await response.text());
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    const digest = sha256.create();
+    let pending = new Uint8Array(0);
+    let previous = null;
+    while (true){
+        const {done, value} = await reader.read();
+        if (done) break;
+        const buffer = new Uint8Array(pending.length + value.length);
+        buffer.set(pending);
+        buffer.set(value, pending.length);
+        let start = 0;
+        let end = buffer.indexOf(10, start);
+        while (end != -1){
+            // a line is only known to be bids once another one follows it
+            if (previous != null){
+                digest.update(previous);
+                onBids(JSON.parse(decoder.decode(previous)).bids);
+            }
+            previous = buffer.slice(start, end + 1);
+            start = end + 1;
+            end = buffer.indexOf(10, start);
+        }
+        pending = buffer.slice(start);
+    }
+    if (previous == null || pending.length != 0) throw new Error("Truncated bid history");
+
+    const envelope = JSON.parse(decoder.decode(previous),
+        (key, value, context) => key == "signature" ? BigInt(context.source) : value
+    );
+    if (!verifyResponse(envelope, getServerKey())) throw new Error("Invalid bid history signature");
+    const summary = JSON.parse(envelope.message);
+    if (summary.sha256 != digest.hex()) throw new Error("Bid history digest mismatch");
+    return summary;
+}
+
+
+// Get list auction request (GET, so the browser cache revalidates it with If-None-Match)
 export async function auctionListRequest(){
     if (getServerKey() == null) await publicKeyRequest();
-    const req = sendRequest("/list-auctions", "POST", {}, getToken(), false);
+    const req = sendRequest("/list-auctions", "GET", {}, getToken(), false);
     let data = await getData(req);
     return data;
 }
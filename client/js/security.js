@@ -75,6 +75,41 @@ export function rsaVerify(message, signature, {e, n}){
     return hash == verify;
 }
 
+// Checks a server response. With RESPONSE_SIGNING = "merkle" the message is
+// one leaf of a Merkle tree: the root is rebuilt from the inclusion proof
+// and the server signature covers "merkle-root:" + root.
+export function verifyResponse(data, {e, n}){
+    if (data.merkle == null){
+        return rsaVerify(data.message, data.signature, {e, n});
+    }
+    let node = sha256.array([0, ...new TextEncoder().encode(data.message)]);
+    for (const [side, sibling] of data.merkle.proof){
+        const other = hexToBytes(sibling);
+        if (side == "L"){
+            node = sha256.array([1, ...other, ...node]);
+        }
+        else{
+            node = sha256.array([1, ...node, ...other]);
+        }
+    }
+    if (bytesToHex(node) != data.merkle.root){
+        return false;
+    }
+    return rsaVerify("merkle-root:" + data.merkle.root, data.signature, {e, n});
+}
+
+function hexToBytes(hex){
+    const bytes = [];
+    for (let i = 0; i < hex.length; i += 2){
+        bytes.push(parseInt(hex.substr(i, 2), 16));
+    }
+    return bytes;
+}
+
+function bytesToHex(bytes){
+    return Array.from(bytes, (b) => b.toString(16).padStart(2, "0")).join("");
+}
+
 function getRandomBytes(len) {
   const bytes = new Uint8Array(len);
   crypto.getRandomValues(bytes);
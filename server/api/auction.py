@@ -1,6 +1,8 @@
 # Builtins
-import jwt
-from datetime import datetime
+import asyncio
+import hashlib
+import logging
+import time
 from typing import List, Optional
 
 
@@ -9,19 +11,22 @@ from fastapi import (
     File,
     Form,
     Depends,
+    Request,
     APIRouter,
     UploadFile,
 )
-from fastapi.responses import JSONResponse
+from fastapi.responses import Response, StreamingResponse
 from fastapi.security import HTTPAuthorizationCredentials
-from fastapi.encoders import jsonable_encoder
 
 
-# Database
-import aiosqlite
-
 # Internal CONFIG
-from config.config import DB_PATH, SECRET_KEY, ALGORITHM
+from config.config import (
+    AUCTION_PAGE_MAX_LIMIT,
+    BID_BATCH_MAX_SIZE,
+    PRICE_STREAM_KEEPALIVE_SECONDS,
+    PRICE_STREAM_MAX_AUCTIONS,
+)
+from common.database import Database
 from config.loader import security
 from common.encrypted import rsa_decrypt, rsa_encrypt, rsa_sign, rsa_verify, public_server_key, private_server_key, hash_password, check_password, create_access_token
 from common.utils import (
@@ -58,6 +63,16 @@ from services.bids import Bid
 from services.auction import Auction
 from services.images import Image
 from services.users import Users
+from services.identity import Identity, Principal
+from services.bidbook import BidBook
+from services.bidactor import BidActors, BidRejected
+from services.pricefeed import PriceFeed
+from services.catalog import Catalog
+from common.metrics import Metrics
+from common.signcache import SignedCache, CATALOG
+from common.merkle import ResponseSigner
+from common.canonical import canonical_json, envelope_body, envelope_response
+from common.replay import NonceStore
 
 # Common
 from common.utils import (
@@ -70,45 +85,30 @@ from common.utils import (
 )
 
 auction_router = APIRouter()
+logger = logging.getLogger(__name__)
 
 
+def auction_id_from(message_dict: dict) -> int:
+    try:
+        return int(message_dict["auction_id"])
+    except (KeyError, TypeError, ValueError):
+        errorMessage(400, 48, "Invalid auction id")
 
-async def get_current_user(
+
+
+async def get_current_principal(
     credentials: Optional[HTTPAuthorizationCredentials] = Depends(security),
-) -> int:
+) -> Principal:
     if credentials is None:
         errorMessage(401, 13, "User not identified")
 
-    token = credentials.credentials
+    return await Identity.resolve(credentials.credentials)
 
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-    except jwt.ExpiredSignatureError:
-        errorMessage(401, 14, "Token expired")
-    except jwt.InvalidTokenError:
-        errorMessage(401, 15, "Invalid token")
-
-    raw_user_id = payload.get("sub") or payload.get("user_id")
-    if raw_user_id is None:
-        errorMessage(401, 16, "User id not found in token")
 
-    try:
-        user_id = int(raw_user_id)
-    except (TypeError, ValueError):
-        errorMessage(401, 17, "Invalid user id in token")
-
-    async with aiosqlite.connect(DB_PATH) as db:
-        db.row_factory = aiosqlite.Row
-        cursor = await db.execute(
-            "SELECT id FROM UserInfo WHERE id = ?",
-            (user_id,),
-        )
-        row = await cursor.fetchone()
-
-    if row is None:
-        errorMessage(401, 13, "User not identified")
-
-    return user_id
+async def get_current_user(
+    principal: Principal = Depends(get_current_principal),
+) -> int:
+    return principal.id
 
 
 # ---------- AUCTIONS ----------
@@ -124,12 +124,13 @@ async def create_auction(
     # timestamp: int = Form(...),
     data: OtherRequests,
     # image: UploadFile = File(...),
-    current_user_id = Depends(get_current_user),
+    principal: Principal = Depends(get_current_principal),
 ):
     message = data.message
     signature = data.signature
 
-    user_public_key = await Users.get_user_public_key(current_user_id)
+    current_user_id = principal.id
+    user_public_key = principal.public_key
 
     if not rsa_verify(message, signature, user_public_key):
         errorMessage(401, 00, "Signature verification failed")
@@ -139,6 +140,8 @@ async def create_auction(
     except:
         errorMessage(400, 00, "Invalid JSON in message")
 
+    NonceStore.check(current_user_id, message_dict.get("nonce"), message_dict.get("issued_at"))
+
     title = message_dict["title"]
     description = message_dict["description"]
     price = int(message_dict["price"])
@@ -179,40 +182,106 @@ async def create_auction(
     #     f.write(contents)
 
 
-    private_key = private_server_key()
     auction_dict = auction.model_dump(mode='json')
-    message = json.dumps(auction_dict, separators=(",", ":"), sort_keys=True)
+    message = canonical_json(auction_dict)
 
-    signature = rsa_sign(message, private_key)
-
-    return JSONResponse(
-        content=jsonable_encoder(
-            {
-                "message": message,
-                "signature": signature,
-            }
-        )
-    )   
+    envelope = await ResponseSigner.sign(message)
+    return envelope_response(envelope)   
 
 
+@auction_router.get(
+    "/list-auctions",
+    response_model=Optional[List[AuctionSchema]],
+)
 @auction_router.post(
     "/list-auctions",
     response_model=Optional[List[AuctionSchema]],
 )
-async def list_auctions():
-    private_key = private_server_key()
-    auctions = await Auction.get_all()
-    auctions_dict = [auction.model_dump(mode="json") for auction in auctions]
-    message = json.dumps(auctions_dict, separators=(",", ":"), sort_keys=True)
-    signature = rsa_sign(message, private_key)
-    return JSONResponse(
-        content=jsonable_encoder(
-            {
-                "message": message,
-                "signature": signature,
-            }
-        )
-    )  
+async def list_auctions(request: Request):
+    """
+    Signed catalog with a strong ETag. Use GET: browsers and HTTP caches
+    revalidate it with If-None-Match and get a 304 while it is unchanged.
+    POST is kept for older clients.
+    """
+    if_none_match = request.headers.get("if-none-match")
+    snapshot = Catalog.current()
+    if snapshot is not None and Catalog.matches(if_none_match, snapshot.etag):
+        Metrics.inc("catalog.not_modified")
+        return Response(status_code=304, headers={"ETag": snapshot.etag})
+
+    snapshot = await Catalog.snapshot()
+    if Catalog.matches(if_none_match, snapshot.etag):
+        Metrics.inc("catalog.not_modified")
+        return Response(status_code=304, headers={"ETag": snapshot.etag})
+    return Response(
+        content=snapshot.body,
+        media_type="application/json",
+        headers={"ETag": snapshot.etag, "Cache-Control": "no-cache"},
+    )
+
+
+@auction_router.post(
+    "/list-auctions/page",
+    summary="One signed page of the auction catalog",
+)
+async def list_auctions_page(data: ListAuctionsRequest):
+    """
+    Keyset-paginated catalog ordered by (end_at, id). The signed message
+    carries the requested cursor and the next one, so a client can check
+    that each page follows the previous page it verified. Price filters
+    are not indexed: their cost grows with the auctions they skip.
+    """
+    if data.limit < 1 or data.limit > AUCTION_PAGE_MAX_LIMIT:
+        errorMessage(400, 49, "Invalid page size")
+    if data.cursor is not None:
+        try:
+            Auction.decode_cursor(data.cursor)
+        except ValueError:
+            errorMessage(400, 50, "Invalid cursor")
+
+    filters = {
+        "status": data.status,
+        "min_price": data.min_price,
+        "max_price": data.max_price,
+        "ending_after": data.ending_after,
+        "ending_before": data.ending_before,
+    }
+    auctions, next_cursor = await Auction.get_page(data.limit, data.cursor, **filters)
+
+    json_response = {
+        "auctions": [auction.model_dump(mode="json") for auction in auctions],
+        "cursor": data.cursor,
+        "next_cursor": next_cursor,
+        "filters": filters,
+    }
+    message = canonical_json(json_response)
+    envelope = await ResponseSigner.sign(message)
+    return envelope_response(envelope)
+
+
+@auction_router.post(
+    "/search-auctions",
+    summary="Full-text search over auction titles and descriptions",
+)
+async def search_auctions(data: SearchAuctionsRequest):
+    if data.limit < 1 or data.limit > AUCTION_PAGE_MAX_LIMIT:
+        errorMessage(400, 49, "Invalid page size")
+    if data.offset < 0:
+        errorMessage(400, 49, "Invalid page size")
+    if Auction.match_expression(data.query) is None:
+        errorMessage(400, 51, "Empty search query")
+
+    auctions = await Auction.search(data.query, data.limit, data.offset)
+
+    json_response = {
+        "auctions": [auction.model_dump(mode="json") for auction in auctions],
+        "query": data.query,
+        "offset": data.offset,
+        "next_offset": data.offset + len(auctions) if len(auctions) == data.limit else None,
+    }
+    message = canonical_json(json_response)
+    envelope = await ResponseSigner.sign(message)
+    return envelope_response(envelope)
 
 
 @auction_router.post(
@@ -223,12 +292,13 @@ async def list_auctions():
 async def get_auction(
     # auction_id: int = Form(...)
     data: OtherRequests,
-    current_user_id = Depends(get_current_user),
+    principal: Principal = Depends(get_current_principal),
 ) -> Optional[AuctionSchema]:
     message = data.message
     signature = data.signature
 
-    user_public_key = await Users.get_user_public_key(current_user_id)
+    current_user_id = principal.id
+    user_public_key = principal.public_key
 
     if not rsa_verify(message, signature, user_public_key):
         errorMessage(401, 00, "Signature verification failed")
@@ -238,24 +308,16 @@ async def get_auction(
     except:
         errorMessage(400, 00, "Invalid JSON in message")
 
-    auction_id = message_dict["auction_id"]
+    auction_id = auction_id_from(message_dict)
 
-    private_key = private_server_key()
-    auction = await Auction.get(auction_id)
-    if auction is None:
-        errorMessage(404, 40, "Auction not found")
-
-    auction_dict = auction.model_dump(mode='json')
-    message = json.dumps(auction_dict, separators=(",", ":"), sort_keys=True)
-    signature = rsa_sign(message, private_key)
-    return JSONResponse(
-        content=jsonable_encoder(
-            {
-                "message": message,
-                "signature": signature,
-            }
-        )
-    )  
+    version = SignedCache.version(auction_id)
+    envelope = SignedCache.get(("auction", auction_id), version)
+    if envelope is None:
+        auction = await Auction.get(auction_id)
+        if auction is None:
+            errorMessage(404, 40, "Auction not found")
+        envelope = SignedCache.put(("auction", auction_id), version, auction.model_dump(mode='json'))
+    return envelope_response(envelope)
 
 
 
@@ -266,12 +328,13 @@ async def get_auction(
 async def delete_auction(
     # auction_id: int = Form(...),
     data: OtherRequests,
-    current_user_id = Depends(get_current_user),
+    principal: Principal = Depends(get_current_principal),
 ):
     message = data.message
     signature = data.signature
 
-    user_public_key = await Users.get_user_public_key(current_user_id)
+    current_user_id = principal.id
+    user_public_key = principal.public_key
 
     if not rsa_verify(message, signature, user_public_key):
         errorMessage(401, 00, "Signature verification failed")
@@ -281,6 +344,8 @@ async def delete_auction(
     except:
         errorMessage(400, 00, "Invalid JSON in message")
 
+    NonceStore.check(current_user_id, message_dict.get("nonce"), message_dict.get("issued_at"))
+
     auction_id = message_dict["auction_id"]    
 
     existing = await Auction.get(auction_id)
@@ -307,12 +372,13 @@ async def delete_auction(
 async def create_bid(
     # data: CreateBidSchema,
     data: OtherRequests,
-    current_user_id = Depends(get_current_user),
+    principal: Principal = Depends(get_current_principal),
 ):
     message = data.message
     signature = data.signature
 
-    user_public_key = await Users.get_user_public_key(current_user_id)
+    current_user_id = principal.id
+    user_public_key = principal.public_key
 
     if not rsa_verify(message, signature, user_public_key):
         errorMessage(401, 00, "Signature verification failed")
@@ -322,39 +388,117 @@ async def create_bid(
     except:
         errorMessage(400, 00, "Invalid JSON in message")
 
+    NonceStore.check(current_user_id, message_dict.get("nonce"), message_dict.get("issued_at"))
+
     auction_id = message_dict["auction_id"]
 
     auction = await Auction.get(auction_id)
     if auction is None:
         errorMessage(404, 40, "Auction not found")
-    now_ts = int(datetime.utcnow().timestamp())
+    now_ts = int(time.time())
     if auction.end_at <= now_ts:
         errorMessage(400, 42, "Auction already finished")
         
-    user = await Users.get(current_user_id)
-    if user.balance < float(message_dict["price"]):
+    if principal.balance < float(message_dict["price"]):
         errorMessage(400, 47, "Insufficient credit")
 
 
 
     bidData = CreateBidSchema(
-        auction_id=auction_id,
+        auction_id=auction.id,
         price=float(message_dict["price"])
     )
 
-    bid = await Bid.create(current_user_id, bidData)
-    private_key = private_server_key()
+    try:
+        bid = await BidActors.bid(bidData.auction_id, current_user_id, bidData.price)
+    except BidRejected as error:
+        errorMessage(400, error.code, error.message)
     bid_dict = bid.model_dump(mode='json')
-    message = json.dumps(bid_dict, separators=(",", ":"), sort_keys=True)
-    signature = rsa_sign(message, private_key)
-    return JSONResponse(
-        content=jsonable_encoder(
-            {
-                "message": message,
-                "signature": signature,
-            }
-        )
-    )
+    message = canonical_json(bid_dict)
+    envelope = await ResponseSigner.sign(message)
+    return envelope_response(envelope)
+
+
+@auction_router.post(
+    "/bids/batch",
+    summary="Create several bids from one signed message",
+)
+async def create_bid_batch(
+    data: OtherRequests,
+    principal: Principal = Depends(get_current_principal),
+):
+    """
+    The message holds {"bids": [{"auction_id", "price"}, ...], nonce, issued_at}.
+    Every bid is checked like /bid, then handed to its auction's BidActor.
+    Credit is checked against one balance snapshot for the whole batch:
+    the accepted bids may together commit at most the balance, counting
+    only the highest bid of the batch on each auction. The signed response lists one result
+    per bid, in order: {"index", "status": "OK", "bid"} or
+    {"index", "status": "ERROR", "code", "message"}.
+    """
+    message = data.message
+    signature = data.signature
+
+    current_user_id = principal.id
+    user_public_key = principal.public_key
+
+    if not rsa_verify(message, signature, user_public_key):
+        errorMessage(401, 00, "Signature verification failed")
+
+    try:
+        message_dict = json.loads(message)
+    except:
+        errorMessage(400, 00, "Invalid JSON in message")
+
+    NonceStore.check(current_user_id, message_dict.get("nonce"), message_dict.get("issued_at"))
+
+    items = message_dict.get("bids")
+    if not isinstance(items, list) or not 0 < len(items) <= BID_BATCH_MAX_SIZE:
+        errorMessage(400, 57, f"A batch holds 1 to {BID_BATCH_MAX_SIZE} bids")
+
+    results = [None] * len(items)
+    parsed = []
+    for index, item in enumerate(items):
+        try:
+            parsed.append((index, int(item["auction_id"]), float(item["price"])))
+        except (KeyError, TypeError, ValueError):
+            results[index] = {"index": index, "status": "ERROR", "code": 56, "message": "Invalid bid"}
+
+    auctions = await Auction.get_many([auction_id for _, auction_id, _ in parsed])
+    now_ts = int(time.time())
+    accepted = []
+    # auction id -> highest price this batch bids on it, and their sum
+    held = {}
+    committed = 0.0
+    for index, auction_id, price in parsed:
+        auction = auctions.get(auction_id)
+        extra = max(price - held.get(auction_id, 0.0), 0.0)
+        if auction is None:
+            results[index] = {"index": index, "status": "ERROR", "code": 40, "message": "Auction not found"}
+        elif auction.end_at <= now_ts:
+            results[index] = {"index": index, "status": "ERROR", "code": 42, "message": "Auction already finished"}
+        elif principal.balance < price or principal.balance < committed + extra:
+            results[index] = {"index": index, "status": "ERROR", "code": 47, "message": "Insufficient credit"}
+        else:
+            committed += extra
+            held[auction_id] = held.get(auction_id, 0.0) + extra
+            accepted.append((index, auction_id, BidActors.submit(auction_id, current_user_id, price)))
+
+    outcomes = await asyncio.gather(*(future for _, _, future in accepted), return_exceptions=True)
+    for (index, auction_id, _), outcome in zip(accepted, outcomes):
+        if isinstance(outcome, BidRejected):
+            results[index] = {"index": index, "status": "ERROR", "code": outcome.code, "message": outcome.message}
+        elif isinstance(outcome, BaseException):
+            # earlier bids may already be committed: report this one, keep the rest
+            logger.error("bid batch item %d (auction %d) failed", index, auction_id, exc_info=outcome)
+            Metrics.inc("bid_batch.errors")
+            results[index] = {"index": index, "status": "ERROR", "code": 59, "message": "Bid could not be recorded"}
+        else:
+            results[index] = {"index": index, "status": "OK", "bid": outcome.model_dump(mode='json')}
+
+    message = canonical_json({"results": results})
+    envelope = await ResponseSigner.sign(message)
+    return envelope_response(envelope)
 
 
 @auction_router.post(
@@ -364,12 +508,13 @@ async def create_bid(
 async def update_price(
     # auction_id: int = Form(...),
     data: OtherRequests,
-    current_user_id = Depends(get_current_user)
+    principal: Principal = Depends(get_current_principal)
 ):
     message = data.message
     signature = data.signature
 
-    user_public_key = await Users.get_user_public_key(current_user_id)
+    current_user_id = principal.id
+    user_public_key = principal.public_key
 
     if not rsa_verify(message, signature, user_public_key):
         errorMessage(401, 00, "Signature verification failed")
@@ -379,27 +524,130 @@ async def update_price(
     except:
         errorMessage(400, 00, "Invalid JSON in message")
 
-    auction_id = message_dict["auction_id"]
+    auction_id = auction_id_from(message_dict)
+
+    version = SignedCache.version(auction_id)
+    updated_price = await current_price(auction_id)
+    return envelope_response(PriceFeed.envelope(auction_id, updated_price, version))
+
+
+async def current_price(auction_id: int) -> Optional[float]:
+    """
+    Highest bid, from the bid book when the auction is tracked.
+    """
+    entry = BidBook.get(auction_id)
+    if entry is not None:
+        return entry.highest_price
 
     auction = await Auction.get(auction_id)
     if auction is None:
         errorMessage(404, 40, "Auction not found")
-    updated_price = await Bid.get_highest(auction_id)
-    private_key = private_server_key()
-    json_response = {
-        "auction_id": auction_id,
-        "updated_price": updated_price
-    }
-    message = json.dumps(json_response, separators=(",", ":"), sort_keys=True)
-    signature = rsa_sign(message, private_key)
-    return JSONResponse(
-        content=jsonable_encoder(
-            {
-                "message": message,
-                "signature": signature,
-            }
-        )
-    )
+    return await Bid.get_highest(auction_id)
+
+
+@auction_router.get(
+    "/price-stream",
+    summary="Stream signed price updates (Server-Sent Events)",
+)
+async def price_stream(
+    auction_ids: str,
+    token: str,
+):
+    """
+    Server-Sent Events stream of /update-price envelopes for a comma-separated
+    list of auction ids. The current price is sent on connect, then one
+    event each time a price changes. EventSource cannot set headers, so the
+    access token is passed as a query parameter.
+    """
+    await Identity.resolve(token)
+
+    try:
+        ids = sorted({int(auction_id) for auction_id in auction_ids.split(",") if auction_id})
+    except ValueError:
+        errorMessage(400, 48, "Invalid auction id list")
+    if not 0 < len(ids) <= PRICE_STREAM_MAX_AUCTIONS:
+        errorMessage(400, 48, f"A price stream follows 1 to {PRICE_STREAM_MAX_AUCTIONS} auctions")
+
+    # subscribe first: a change published while the current prices are
+    # read is then queued for the stream instead of being lost
+    subscriber = PriceFeed.subscribe(ids)
+    try:
+        initial = []
+        for auction_id in ids:
+            version = SignedCache.version(auction_id)
+            initial.append(PriceFeed.envelope(auction_id, await current_price(auction_id), version))
+    except BaseException:
+        PriceFeed.unsubscribe(subscriber)
+        raise
+
+    async def events():
+        try:
+            for envelope in initial:
+                yield f"event: price\ndata: {envelope_body(envelope).decode('utf-8')}\n\n"
+            while True:
+                try:
+                    await asyncio.wait_for(subscriber.event.wait(), PRICE_STREAM_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                for envelope in subscriber.take().values():
+                    yield f"event: price\ndata: {envelope_body(envelope).decode('utf-8')}\n\n"
+        finally:
+            PriceFeed.unsubscribe(subscriber)
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+@auction_router.post(
+    "/bid-history",
+    summary="Stream the bid history of an auction (NDJSON)",
+)
+async def bid_history(
+    data: OtherRequests,
+    principal: Principal = Depends(get_current_principal),
+):
+    """
+    Newline-delimited JSON, newest bid first: one {"bids": [...]} line per
+    chunk, then a last line holding a signed envelope whose message carries
+    the SHA-256 of every preceding byte. A stream without that last line is
+    truncated. Bidders are null while the auction is active.
+    """
+    message = data.message
+    signature = data.signature
+
+    if not rsa_verify(message, signature, principal.public_key):
+        errorMessage(401, 00, "Signature verification failed")
+
+    try:
+        message_dict = json.loads(message)
+    except:
+        errorMessage(400, 00, "Invalid JSON in message")
+
+    auction_id = auction_id_from(message_dict)
+
+    auction = await Auction.get(auction_id)
+    if auction is None:
+        errorMessage(404, 40, "Auction not found")
+    hide_bidders = auction.status == "ACTIVE"
+
+    async def lines():
+        digest = hashlib.sha256()
+        count = 0
+        async for bids in Bid.get_auction_bid_history(auction_id, hide_bidders):
+            line = (canonical_json({"bids": bids}) + "\n").encode("utf-8")
+            digest.update(line)
+            count += len(bids)
+            yield line
+        summary = canonical_json({
+            "auction_id": auction_id,
+            "bidders_hidden": hide_bidders,
+            "count": count,
+            "sha256": digest.hexdigest(),
+        })
+        envelope = await ResponseSigner.sign(summary)
+        yield envelope_body(envelope) + b"\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
 
 
 @auction_router.post(
@@ -409,12 +657,13 @@ async def update_price(
 async def cancel_bid(
     data: OtherRequests,
     # data: GetDeleteBidSchema,
-    current_user_id = Depends(get_current_user),
+    principal: Principal = Depends(get_current_principal),
 ):
     message = data.message
     signature = data.signature
 
-    user_public_key = await Users.get_user_public_key(current_user_id)
+    current_user_id = principal.id
+    user_public_key = principal.public_key
 
     if not rsa_verify(message, signature, user_public_key):
         errorMessage(401, 00, "Signature verification failed")
@@ -424,6 +673,8 @@ async def cancel_bid(
     except:
         errorMessage(400, 00, "Invalid JSON in message")
 
+    NonceStore.check(current_user_id, message_dict.get("nonce"), message_dict.get("issued_at"))
+
     bid_id = message_dict["bid_id"]
 
     existing = await Bid.get(bid_id)
@@ -434,7 +685,7 @@ async def cancel_bid(
         errorMessage(403, 44, "You are not the owner of this bid")
 
 
-    now_ts = int(datetime.utcnow().timestamp())
+    now_ts = int(time.time())
     if (now_ts - existing.created_at) > 10:
         errorMessage(400, 45, "You cannot cancel a bid after 10 seconds")
 
@@ -449,24 +700,15 @@ async def cancel_bid(
     if not deleted:
         errorMessage(404, 43, "Bid not found")
 
-    private_key = private_server_key()
 
     json_response = {
         "status": "CNBID",
         "message": "OK"
     }
 
-    message = json.dumps(json_response, separators=(",", ":"), sort_keys=True)
-    signature = rsa_sign(message, private_key)
-
-    return JSONResponse(
-        content=jsonable_encoder(
-            {
-                "message": message,
-                "signature": signature,
-            }
-        )
-    )
+    message = canonical_json(json_response)
+    envelope = await ResponseSigner.sign(message)
+    return envelope_response(envelope)
 
 @auction_router.post(
     "/balance",
@@ -474,13 +716,14 @@ async def cancel_bid(
 )
 async def balance_endpoint(
     data: OtherRequests,
-    current_user_id = Depends(get_current_user)
+    principal: Principal = Depends(get_current_principal)
     # amount: float = Form(...),
 ):
     message = data.message
     signature = data.signature
 
-    user_public_key = await Users.get_user_public_key(current_user_id)
+    current_user_id = principal.id
+    user_public_key = principal.public_key
 
     if not rsa_verify(message, signature, user_public_key):
         errorMessage(401, 00, "Signature verification failed")
@@ -490,27 +733,22 @@ async def balance_endpoint(
     except:
         errorMessage(400, 00, "Invalid JSON in message")
 
+    NonceStore.check(current_user_id, message_dict.get("nonce"), message_dict.get("issued_at"))
+
     amount = float(message_dict["amount"])
 
     if not check_balance(amount):
         return errorMessage(400, 25, "Le montant n'est pas correcte")
     await Users.add_balance(current_user_id, amount)
-    private_key = private_server_key()
+    Identity.invalidate_user(current_user_id)
     json_response = {
         "status": "OK",
         "message": "Le montant a bien été crédité"
     }
 
-    message = json.dumps(json_response, separators=(",", ":"), sort_keys=True)
-    signature = rsa_sign(message, private_key)
-    return JSONResponse(
-        content=jsonable_encoder(
-            {
-                "message": message,
-                "signature": signature,
-            }
-        )
-    )
+    message = canonical_json(json_response)
+    envelope = await ResponseSigner.sign(message)
+    return envelope_response(envelope)
 
 
 @auction_router.get(
@@ -521,20 +759,11 @@ async def get_balance_endpoint(
     current_user_id = Depends(get_current_user),
 ):
     user_balance = await Users.get_user_balance(current_user_id)
-    private_key = private_server_key()
     json_response = {
         "balance": user_balance,
     }
 
 
-    message = json.dumps(json_response, separators=(",", ":"),
-     sort_keys=True)
-    signature = rsa_sign(message, private_key)
-    return JSONResponse(
-        content=jsonable_encoder(
-            {
-                "message": message,
-                "signature": signature,
-            }
-        )
-    )
\ No newline at end of file
+    message = canonical_json(json_response)
+    envelope = await ResponseSigner.sign(message)
+    return envelope_response(envelope)
\ No newline at end of file
@@ -2,16 +2,17 @@ import uuid
 from datetime import datetime, timedelta
 
 from fastapi import APIRouter, Form
-from fastapi.responses import JSONResponse
-from fastapi.encoders import jsonable_encoder
-import aiosqlite
 import json
 
 # Internals
 from common.utils import errorMessage, validate_password, validate_username
-from common.encrypted import rsa_decrypt, rsa_encrypt, rsa_sign, rsa_verify, public_server_key, private_server_key, hash_password, check_password, create_access_token
-from config.config import DB_PATH, SECRET_KEY, ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES
+from common.encrypted import rsa_decrypt, rsa_encrypt, rsa_sign, rsa_verify, public_server_key, private_server_key, hash_password_async, check_password_async, create_access_token
+from common.database import Database
+from common.merkle import ResponseSigner
+from common.canonical import canonical_json, envelope_response
+from config.config import SECRET_KEY, ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES
 from services.users import Users
+from services.identity import Identity
 from schemas.request import *
 
 router = APIRouter(prefix="/auth", tags=["auth"])
@@ -46,12 +47,13 @@ async def register_endpoint(
     if username_decrypted == None:
         return errorMessage(400, 11, "Argument invalide")
     password_decrypted = rsa_decrypt(format_Password, private_key)
-    password_hash = hash_password(password_decrypted)
 
     validate_password(password_decrypted)
     await validate_username(username_decrypted)
 
-    async with aiosqlite.connect(DB_PATH) as conn:
+    password_hash = await hash_password_async(password_decrypted)
+
+    async with Database.connection() as conn:
         await conn.execute(
             "INSERT INTO UserInfo (username, password_hash, balance, created_at, public_key_e, public_key_n) VALUES (?, ?, 0, ?, ?, ?)",
             (username_decrypted, password_hash, datetime.utcnow().timestamp(), str(public_key_e), str(public_key_n)),
@@ -63,18 +65,10 @@ async def register_endpoint(
         "message": "OK",
     }
 
-    message = json.dumps(json_Response, separators=(",", ":"), sort_keys=True)
+    message = canonical_json(json_Response)
 
-    signature = rsa_sign(message, private_key)
-
-    return JSONResponse(
-        content=jsonable_encoder(
-            {
-                "message": message,
-                "signature": signature,
-            }
-        )
-    )
+    envelope = await ResponseSigner.sign(message)
+    return envelope_response(envelope)
 
 
 @router.post("/login")
@@ -97,21 +91,25 @@ async def login_endpoint(
     username_decrypted = rsa_decrypt(format_Username, private_key)
     password_decrypted = rsa_decrypt(format_Password, private_key)
 
-    async with aiosqlite.connect(DB_PATH) as conn:
-        sql = "UPDATE UserInfo SET public_key_e = ?, public_key_n = ? WHERE username = ?"
-        await conn.execute(sql, (public_key_e, public_key_n, username_decrypted, ))
-        conn.row_factory = aiosqlite.Row
+    async with Database.connection() as conn:
         cursor = await conn.execute(
             "SELECT id, password_hash FROM UserInfo WHERE username = ?",
             (username_decrypted,),
         )
         row = await cursor.fetchone()
 
-    if row is None or not check_password(password_decrypted, row["password_hash"]):
+    if row is None or not await check_password_async(password_decrypted, row["password_hash"]):
         errorMessage(401, 20, "Authentification échouée")
 
     user_id = row["id"]
 
+    # only an authenticated login may replace the stored key
+    async with Database.connection() as conn:
+        sql = "UPDATE UserInfo SET public_key_e = ?, public_key_n = ? WHERE id = ?"
+        await conn.execute(sql, (public_key_e, public_key_n, user_id, ))
+        await conn.commit()
+    Identity.invalidate_user(user_id)
+
     access_token = create_access_token({"sub": str(user_id)})
 
     username_encrypted = rsa_encrypt(username_decrypted, {"e": int(public_key_e), "n": int(public_key_n)})
@@ -124,18 +122,10 @@ async def login_endpoint(
         "token_type": "bearer",
     }
 
-    message = json.dumps(json_Response, separators=(",", ":"), sort_keys=True)
+    message = canonical_json(json_Response)
 
-    signature = rsa_sign(message, private_key)
-
-    return JSONResponse(
-        content=jsonable_encoder(
-            {
-                "message": message,
-                "signature": signature,
-            }
-        )
-    )
+    envelope = await ResponseSigner.sign(message)
+    return envelope_response(envelope)
 
 
 @router.get("/public-key")
@@ -143,15 +133,13 @@ async def publickey_endpoint():
     json_Response = public_server_key()
     private_key = private_server_key()
 
-    message = json.dumps(json_Response, separators=(",", ":"), sort_keys=True)
+    message = canonical_json(json_Response)
 
     signature = rsa_sign(message, private_key)
 
-    return JSONResponse(
-        content=jsonable_encoder(
-            {
-                "message": message,
-                "signature": signature
-            }
-        )
+    return envelope_response(
+        {
+            "message": message,
+            "signature": signature
+        }
     )
\ No newline at end of file
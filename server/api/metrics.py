@@ -0,0 +1,11 @@
+from fastapi import APIRouter
+
+# Internals
+from common.metrics import Metrics
+
+router = APIRouter(tags=["metrics"])
+
+
+@router.get("/metrics")
+async def metrics_endpoint():
+    return Metrics.snapshot()
@@ -0,0 +1,48 @@
+"""
+Big-integer backend for the RSA primitives.
+
+gmpy2 is used when it is installed, pure Python otherwise. Every function
+returns a plain int so the callers' output is identical on both backends.
+"""
+try:
+    import gmpy2
+except ImportError:  # pragma: no cover - optional dependency
+    gmpy2 = None
+
+
+BACKENDS = ("python", "gmpy2") if gmpy2 is not None else ("python",)
+
+
+def _python_powmod(base: int, exp: int, mod: int) -> int:
+    return pow(base, exp, mod)
+
+
+def _gmpy2_powmod(base: int, exp: int, mod: int) -> int:
+    return int(gmpy2.powmod(base, exp, mod))
+
+
+_POWMOD = {"python": _python_powmod}
+if gmpy2 is not None:
+    _POWMOD["gmpy2"] = _gmpy2_powmod
+
+_backend = BACKENDS[-1]
+_powmod = _POWMOD[_backend]
+
+
+def set_backend(name: str):
+    """
+    Selects the backend by name ("python" or "gmpy2").
+    """
+    global _backend, _powmod
+    if name not in _POWMOD:
+        raise ValueError(f"Unknown or unavailable big-integer backend: {name}")
+    _backend = name
+    _powmod = _POWMOD[name]
+
+
+def get_backend() -> str:
+    return _backend
+
+
+def powmod(base: int, exp: int, mod: int) -> int:
+    return _powmod(base, exp, mod)
@@ -0,0 +1,75 @@
+# Builtins
+import json
+from typing import Optional
+
+# FastAPI
+from fastapi.responses import Response
+
+# Optional: orjson is only a faster path, the output is the same without it
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+
+# Every digit folded to b"0", so one substring search finds any "<digit>e"
+_FOLD_DIGITS = bytes.maketrans(b"123456789", b"000000000")
+
+
+def _divergent(out: bytes) -> bool:
+    """
+    orjson output that may differ from json.dumps: exponent or tiny floats
+    (1e16 vs 1e+16, 0.00001 vs 1e-05) and DEL, which json escapes.
+    A false positive (e.g. "2e" inside a string) only costs a json.dumps.
+    """
+    return b"0.0000" in out or b"\x7f" in out or b"0e" in out.translate(_FOLD_DIGITS)
+
+
+def canonical_json(payload) -> str:
+    """
+    The signed message format: json.dumps(payload, separators=(",", ":"),
+    sort_keys=True), ASCII only. orjson is used when its output is
+    byte-identical, which holds for every str-keyed payload of finite
+    numbers (NaN and infinities are not JSON; never sign them).
+    """
+    if orjson is not None:
+        try:
+            out = orjson.dumps(payload, option=orjson.OPT_SORT_KEYS)
+        except TypeError:
+            out = None
+        if out is not None and out.isascii() and not _divergent(out):
+            return out.decode("ascii")
+    return json.dumps(payload, separators=(",", ":"), sort_keys=True)
+
+
+def _value(value) -> bytes:
+    if type(value) is int:
+        # signatures exceed 64 bits, which orjson refuses
+        return str(value).encode("ascii")
+    if orjson is not None:
+        try:
+            out = orjson.dumps(value)
+            if b"\x7f" not in out:
+                return out
+        except TypeError:
+            pass
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def envelope_body(envelope: dict) -> bytes:
+    """
+    Response body of a signed envelope, in key order: the same bytes as
+    JSONResponse(content=jsonable_encoder(envelope)).body.
+    """
+    return b"{" + b",".join(
+        _value(key) + b":" + _value(value) for key, value in envelope.items()
+    ) + b"}"
+
+
+def envelope_response(envelope: dict, status_code: int = 200, headers: Optional[dict] = None) -> Response:
+    return Response(
+        content=envelope_body(envelope),
+        status_code=status_code,
+        headers=headers,
+        media_type="application/json",
+    )
@@ -0,0 +1,117 @@
+# Builtins
+import time
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Optional
+
+# Database
+import aiosqlite
+
+# Internals
+from common.metrics import Metrics
+from config.config import DB_PATH, DB_POOL_SIZE, DB_PROFILE, DB_PROFILES
+
+
+# journal_mode is stored in the database file, the others are per connection
+PRAGMA_ORDER = (
+    "journal_mode",
+    "synchronous",
+    "cache_size",
+    "mmap_size",
+    "temp_store",
+    "busy_timeout",
+)
+
+
+def profile_pragmas(profile: str = DB_PROFILE) -> list:
+    """
+    Returns the PRAGMA statements of a storage profile from DB_PROFILES.
+    """
+    if profile not in DB_PROFILES:
+        raise ValueError(f"Unknown storage profile: {profile}")
+    settings = DB_PROFILES[profile]
+    return [
+        f"PRAGMA {name} = {settings[name]};"
+        for name in PRAGMA_ORDER
+        if name in settings
+    ]
+
+
+async def apply_profile(conn: aiosqlite.Connection, profile: str = DB_PROFILE):
+    for statement in profile_pragmas(profile):
+        await conn.execute(statement)
+
+
+class Database:
+    """
+    Pool of pre-configured aiosqlite connections shared by every service.
+    Opened at startup and closed at shutdown; connections come back with
+    row_factory and pragmas already applied.
+    """
+    _path: Optional[str] = None
+    _profile: str = DB_PROFILE
+    _pool: Optional[asyncio.Queue] = None
+    _connections: list = []
+
+    @staticmethod
+    async def _connect(path: str) -> aiosqlite.Connection:
+        conn = await aiosqlite.connect(path)
+        conn.row_factory = aiosqlite.Row
+        await conn.execute("PRAGMA foreign_keys = ON;")
+        await apply_profile(conn, Database._profile)
+        Metrics.inc("db_pool.connections_opened")
+        return conn
+
+    @staticmethod
+    async def open(path: str = DB_PATH, size: int = DB_POOL_SIZE, profile: str = DB_PROFILE):
+        if Database._pool is not None:
+            return
+        Database._path = path
+        Database._profile = profile
+        Database._pool = asyncio.Queue()
+        Database._connections = []
+        for _ in range(size):
+            conn = await Database._connect(path)
+            Database._connections.append(conn)
+            Database._pool.put_nowait(conn)
+        Metrics.gauge("db_pool.size", size)
+        Metrics.gauge("db_pool.in_use", 0)
+
+    @staticmethod
+    async def close():
+        if Database._pool is None:
+            return
+        for conn in Database._connections:
+            await conn.close()
+            Metrics.inc("db_pool.connections_closed")
+        Database._pool = None
+        Database._connections = []
+
+    @staticmethod
+    @asynccontextmanager
+    async def connection():
+        """
+        Borrows a connection for the duration of the block.
+        Anything left uncommitted is rolled back before it is returned.
+        """
+        if Database._pool is None:
+            await Database.open()
+
+        start = time.perf_counter()
+        conn = await Database._pool.get()
+        Metrics.observe("db_pool.wait_seconds", time.perf_counter() - start)
+        Metrics.add_gauge("db_pool.in_use", 1)
+        try:
+            yield conn
+        finally:
+            try:
+                if conn.in_transaction:
+                    await conn.rollback()
+            except Exception:
+                await conn.close()
+                Metrics.inc("db_pool.connections_closed")
+                Database._connections.remove(conn)
+                conn = await Database._connect(Database._path)
+                Database._connections.append(conn)
+            Metrics.add_gauge("db_pool.in_use", -1)
+            Database._pool.put_nowait(conn)
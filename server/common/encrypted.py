@@ -1,24 +1,93 @@
 import jwt
+import time
 import bcrypt
 import json
+import base64
+import struct
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from Crypto.PublicKey import RSA
 from Crypto.Util.number import bytes_to_long, long_to_bytes
 from Crypto.Hash import SHA256
+from Crypto.Cipher import AES, PKCS1_OAEP
+from Crypto.Random import get_random_bytes
+from typing import Iterable, Iterator
 
 # Internals
+from common.bigint import powmod
+from common.metrics import Metrics
 from config.config import (
     RSA_KEYS_PATH,
+    PASSWORD_HASH_WORKERS,
     ALGORITHM,
     SECRET_KEY,
     ACCESS_TOKEN_EXPIRE_MINUTES,
+    HYBRID_CHUNK_SIZE,
 )
 
 
+class ServerKey:
+    """
+    Server RSA key material, loaded once from RSA_KEYS_PATH.
+    The CRT parameters (p, q, dP, dQ, qInv) are recovered from (n, e, d)
+    at load time so every private-key operation runs on half-size moduli.
+    """
+    _public = None
+    _private = None
+
+    @staticmethod
+    def load(path: str = RSA_KEYS_PATH):
+        with open(path, "r", encoding="utf-8") as f:
+            keys = json.load(f)
+
+        n, e, d = int(keys["n"]), int(keys["e"]), int(keys["d"])
+        key = RSA.construct((n, e, d))
+        p, q = key.p, key.q
+
+        ServerKey._public = {"e": e, "n": n}
+        ServerKey._private = {
+            "e": e,
+            "d": d,
+            "n": n,
+            "p": p,
+            "q": q,
+            "dP": d % (p - 1),
+            "dQ": d % (q - 1),
+            "qInv": pow(q, -1, p),
+        }
+
+    @staticmethod
+    def public() -> dict:
+        if ServerKey._public is None:
+            ServerKey.load()
+        return ServerKey._public
+
+    @staticmethod
+    def private() -> dict:
+        if ServerKey._private is None:
+            ServerKey.load()
+        return ServerKey._private
+
+
+def _private_pow(m, privateKey):
+    """
+    m^d mod n, through the CRT when the key carries its precomputed factors.
+    """
+    if "qInv" not in privateKey:
+        return powmod(m, privateKey["d"], privateKey["n"])
+
+    p, q = privateKey["p"], privateKey["q"]
+    m1 = powmod(m % p, privateKey["dP"], p)
+    m2 = powmod(m % q, privateKey["dQ"], q)
+    h = (privateKey["qInv"] * (m1 - m2)) % p
+    return m2 + h * q
+
+
 def rsa_sign(message, privateKey):
     hash = SHA256.new(message.encode("utf-8"))
     m = bytes_to_long(hash.digest())
-    signature = pow(m, privateKey["d"], privateKey["n"])
+    signature = _private_pow(m, privateKey)
     return signature
 
 
@@ -26,7 +95,7 @@ def rsa_verify(message, signature, publicKey):
     hash = SHA256.new(message.encode("utf-8"))
     m = hash.hexdigest()
 
-    verify = pow(int(signature), publicKey["e"], publicKey["n"])
+    verify = powmod(int(signature), publicKey["e"], publicKey["n"])
     verify = long_to_bytes(verify).decode("utf-8")
     return m == verify
 
@@ -35,33 +104,162 @@ def rsa_encrypt(message, publicKey):
     m = bytes_to_long(message.encode("utf-8"))
     if m >= publicKey["n"]:
         return None
-    c = pow(m, publicKey["e"], publicKey["n"])
+    c = powmod(m, publicKey["e"], publicKey["n"])
     return str(c)
 
 
 def rsa_decrypt(cipher, privateKey):
-    m = pow(cipher, privateKey["d"], privateKey["n"])
+    m = _private_pow(cipher, privateKey)
     return long_to_bytes(m).decode("utf-8")
 
 
-def public_server_key():
-    json_data = open(RSA_KEYS_PATH)
-    keys = json.load(json_data)
+# ---------- HYBRID (RSA-wrapped key + AES-GCM) ----------
+#
+# For payloads that do not fit under the modulus. Format:
+#   header: b"HYB2" | key length (2 bytes) | RSA-OAEP (SHA-256) wrapped AES-256 key | nonce prefix (8 bytes)
+#   frames: ciphertext length (4 bytes) | final flag (1 byte) | ciphertext | GCM tag (16 bytes)
+# Frame i uses nonce prefix | i (4 bytes) and authenticates its final flag,
+# so frames cannot be reordered, dropped or the stream cut short.
 
-    return {
-        "e": int(keys["e"]),
-        "n": int(keys["n"])
-    }
+HYBRID_MAGIC = b"HYB2"
+_FRAME_HEADER = struct.Struct(">IB")
+_MAX_FRAME = 1 << 24
 
 
-def private_server_key():
-    json_data = open(RSA_KEYS_PATH)
-    keys = json.load(json_data)
+def _oaep(key: dict):
+    """
+    OAEP cipher for one of our key dicts (private ones need "e" as well).
+    """
+    if "d" not in key:
+        rsa_key = RSA.construct((key["n"], key["e"]))
+    elif "p" in key:
+        rsa_key = RSA.construct((key["n"], key["e"], key["d"], key["p"], key["q"]), consistency_check=False)
+    else:
+        rsa_key = RSA.construct((key["n"], key["e"], key["d"]), consistency_check=False)
+    return PKCS1_OAEP.new(rsa_key, hashAlgo=SHA256)
+
+
+def _seal_frame(key: bytes, prefix: bytes, counter: int, data: bytes, final: bool) -> bytes:
+    flag = 1 if final else 0
+    cipher = AES.new(key, AES.MODE_GCM, nonce=prefix + counter.to_bytes(4, "big"))
+    cipher.update(bytes((flag,)))
+    ciphertext, tag = cipher.encrypt_and_digest(data)
+    return _FRAME_HEADER.pack(len(ciphertext), flag) + ciphertext + tag
+
+
+def hybrid_encrypt_stream(chunks: Iterable[bytes], publicKey, chunk_size: int = HYBRID_CHUNK_SIZE) -> Iterator[bytes]:
+    """
+    Encrypts a stream of byte chunks for publicKey, yielding the header then
+    one frame per chunk_size bytes of plaintext.
+    Raises ValueError right away if chunk_size exceeds what decryption accepts.
+    """
+    if not 0 < chunk_size <= _MAX_FRAME:
+        raise ValueError(f"chunk_size must be between 1 and {_MAX_FRAME}")
+    return _encrypt_frames(chunks, publicKey, chunk_size)
+
+
+def _encrypt_frames(chunks: Iterable[bytes], publicKey, chunk_size: int) -> Iterator[bytes]:
+    key = get_random_bytes(32)
+    prefix = get_random_bytes(8)
+    wrapped = _oaep(publicKey).encrypt(key)
+    yield HYBRID_MAGIC + struct.pack(">H", len(wrapped)) + wrapped + prefix
+
+    tail = b""
+    counter = 0
+    for chunk in chunks:
+        data = memoryview(tail + chunk if tail else chunk)
+        offset = 0
+        # keep the tail back: the last frame is only known at the end
+        while len(data) - offset > chunk_size:
+            yield _seal_frame(key, prefix, counter, data[offset:offset + chunk_size], final=False)
+            offset += chunk_size
+            counter += 1
+        tail = bytes(data[offset:])
+    yield _seal_frame(key, prefix, counter, tail, final=True)
+
+
+class _StreamReader:
+    def __init__(self, chunks: Iterable[bytes]):
+        self._chunks = iter(chunks)
+        self._buffer = b""
+        self._offset = 0
+
+    def read(self, size: int) -> memoryview:
+        while len(self._buffer) - self._offset < size:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                break
+            self._buffer = self._buffer[self._offset:] + chunk
+            self._offset = 0
+        data = memoryview(self._buffer)[self._offset:self._offset + size]
+        self._offset += len(data)
+        return data
+
+    def exhausted(self) -> bool:
+        return not self.read(1)
+
 
-    return {
-        "d": int(keys["d"]),
-        "n": int(keys["n"])
-    }
+def hybrid_decrypt_stream(chunks: Iterable[bytes], privateKey) -> Iterator[bytes]:
+    """
+    Decrypts a hybrid_encrypt_stream output, yielding plaintext frame by frame.
+    Raises ValueError on a malformed, tampered or truncated stream.
+    """
+    reader = _StreamReader(chunks)
+    if bytes(reader.read(4)) != HYBRID_MAGIC:
+        raise ValueError("Not a hybrid envelope")
+    (wrapped_length,) = struct.unpack(">H", reader.read(2))
+    wrapped = reader.read(wrapped_length)
+    prefix = reader.read(8)
+    if len(wrapped) != wrapped_length or len(prefix) != 8:
+        raise ValueError("Truncated envelope")
+
+    key = _oaep(privateKey).decrypt(bytes(wrapped))
+    if len(key) != 32:
+        raise ValueError("Invalid wrapped key")
+
+    counter = 0
+    while True:
+        header = reader.read(_FRAME_HEADER.size)
+        if len(header) != _FRAME_HEADER.size:
+            raise ValueError("Truncated envelope")
+        length, flag = _FRAME_HEADER.unpack(header)
+        if length > _MAX_FRAME or flag not in (0, 1):
+            raise ValueError("Invalid frame")
+        body = reader.read(length + 16)
+        if len(body) != length + 16:
+            raise ValueError("Truncated envelope")
+
+        cipher = AES.new(key, AES.MODE_GCM, nonce=bytes(prefix) + counter.to_bytes(4, "big"))
+        cipher.update(bytes((flag,)))
+        yield cipher.decrypt_and_verify(body[:length], body[length:])
+
+        if flag:
+            if not reader.exhausted():
+                raise ValueError("Data after the final frame")
+            return
+        counter += 1
+
+
+def hybrid_encrypt(message, publicKey) -> str:
+    """
+    Encrypts a message of any length (str or bytes) into a base64 envelope,
+    where rsa_encrypt would return None.
+    """
+    if isinstance(message, str):
+        message = message.encode("utf-8")
+    return base64.b64encode(b"".join(hybrid_encrypt_stream((message,), publicKey))).decode("ascii")
+
+
+def hybrid_decrypt(envelope: str, privateKey) -> bytes:
+    return b"".join(hybrid_decrypt_stream((base64.b64decode(envelope),), privateKey))
+
+
+def public_server_key():
+    return dict(ServerKey.public())
+
+
+def private_server_key():
+    return ServerKey.private()
 
 
 def hash_password(password):
@@ -72,6 +270,52 @@ def check_password(password, hashed_password):
     return bcrypt.checkpw(password.encode('utf-8'), hashed_password)
 
 
+class PasswordPool:
+    """
+    Bounded worker pool for bcrypt so hashing never blocks the event loop.
+    Reports the number of calls waiting for a worker as
+    password_pool.queue_depth.
+    """
+    _executor = None
+
+    @staticmethod
+    def start(workers: int = PASSWORD_HASH_WORKERS):
+        if PasswordPool._executor is None:
+            PasswordPool._executor = ThreadPoolExecutor(
+                max_workers=workers, thread_name_prefix="bcrypt"
+            )
+            Metrics.gauge("password_pool.workers", workers)
+            Metrics.gauge("password_pool.queue_depth", 0)
+
+    @staticmethod
+    def shutdown():
+        if PasswordPool._executor is not None:
+            PasswordPool._executor.shutdown(wait=True)
+            PasswordPool._executor = None
+
+    @staticmethod
+    async def run(fn, *args):
+        PasswordPool.start()
+        submitted = time.perf_counter()
+        Metrics.add_gauge("password_pool.queue_depth", 1)
+
+        def job():
+            Metrics.add_gauge("password_pool.queue_depth", -1)
+            Metrics.observe("password_pool.wait_seconds", time.perf_counter() - submitted)
+            return fn(*args)
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(PasswordPool._executor, job)
+
+
+async def hash_password_async(password):
+    return await PasswordPool.run(hash_password, password)
+
+
+async def check_password_async(password, hashed_password):
+    return await PasswordPool.run(check_password, password, hashed_password)
+
+
 def create_access_token(data: dict, expires_delta: timedelta | None = None) -> str:
     to_encode = data.copy()
     now = datetime.utcnow()
@@ -0,0 +1,154 @@
+# Builtins
+import time
+import asyncio
+import hashlib
+from typing import List, Optional, Tuple
+
+# Internals
+from common.encrypted import rsa_sign, private_server_key
+from common.metrics import Metrics
+from config.config import (
+    RESPONSE_SIGNING,
+    MERKLE_BATCH_WINDOW_MS,
+    MERKLE_BATCH_MAX_SIZE,
+)
+
+
+# The server signs ROOT_PREFIX + root (hex), never a bare root
+ROOT_PREFIX = "merkle-root:"
+
+
+def leaf_hash(message: str) -> bytes:
+    return hashlib.sha256(b"\x00" + message.encode("utf-8")).digest()
+
+
+def node_hash(left: bytes, right: bytes) -> bytes:
+    return hashlib.sha256(b"\x01" + left + right).digest()
+
+
+def build_tree(leaves: List[bytes]) -> List[List[bytes]]:
+    """
+    Levels of the tree, leaves first, root last. An odd node is carried up
+    to the next level unchanged.
+    """
+    levels = [leaves]
+    while len(levels[-1]) > 1:
+        level = levels[-1]
+        parents = [node_hash(level[i], level[i + 1]) for i in range(0, len(level) - 1, 2)]
+        if len(level) % 2:
+            parents.append(level[-1])
+        levels.append(parents)
+    return levels
+
+
+def inclusion_proof(levels: List[List[bytes]], index: int) -> List[Tuple[str, str]]:
+    """
+    Siblings from the leaf up, as ("L" | "R", hex): the side the sibling is on.
+    """
+    proof = []
+    for level in levels[:-1]:
+        sibling = index ^ 1
+        if sibling < len(level):
+            proof.append(("L" if sibling < index else "R", level[sibling].hex()))
+        index //= 2
+    return proof
+
+
+def root_from_proof(message: str, proof: List[Tuple[str, str]]) -> str:
+    node = leaf_hash(message)
+    for side, sibling in proof:
+        if side == "L":
+            node = node_hash(bytes.fromhex(sibling), node)
+        else:
+            node = node_hash(node, bytes.fromhex(sibling))
+    return node.hex()
+
+
+def rsa_verify_digest(message: str, signature, public_key: dict) -> bool:
+    """
+    Verifies a server signature (rsa_sign signs the raw SHA-256 digest).
+    """
+    digest = int.from_bytes(hashlib.sha256(message.encode("utf-8")).digest(), "big")
+    return pow(int(signature), public_key["e"], public_key["n"]) == digest
+
+
+def verify_envelope(envelope: dict, public_key: dict) -> bool:
+    """
+    Checks a signed response in either mode.
+    """
+    merkle = envelope.get("merkle")
+    if merkle is None:
+        return rsa_verify_digest(envelope["message"], envelope["signature"], public_key)
+    if root_from_proof(envelope["message"], merkle["proof"]) != merkle["root"]:
+        return False
+    return rsa_verify_digest(ROOT_PREFIX + merkle["root"], envelope["signature"], public_key)
+
+
+class ResponseSigner:
+    """
+    Signs response messages into {message, signature} envelopes.
+    In "merkle" mode the messages of a MERKLE_BATCH_WINDOW_MS window are
+    leaves of one Merkle tree; only its root is RSA-signed, and each
+    envelope also carries {"merkle": {"root", "proof"}}.
+    """
+    _pending: List[tuple] = []
+    _full: Optional[asyncio.Event] = None
+    _task: Optional[asyncio.Task] = None
+
+    @staticmethod
+    async def sign(message: str) -> dict:
+        if RESPONSE_SIGNING != "merkle":
+            return {
+                "message": message,
+                "signature": rsa_sign(message, private_server_key()),
+            }
+
+        future = asyncio.get_running_loop().create_future()
+        ResponseSigner._pending.append((message, future))
+        if ResponseSigner._task is None or ResponseSigner._task.done():
+            ResponseSigner._full = asyncio.Event()
+            ResponseSigner._task = asyncio.create_task(ResponseSigner._run())
+        elif len(ResponseSigner._pending) >= MERKLE_BATCH_MAX_SIZE:
+            ResponseSigner._full.set()
+        return await future
+
+    @staticmethod
+    async def _run():
+        while ResponseSigner._pending:
+            if len(ResponseSigner._pending) < MERKLE_BATCH_MAX_SIZE:
+                try:
+                    await asyncio.wait_for(ResponseSigner._full.wait(), timeout=MERKLE_BATCH_WINDOW_MS / 1000)
+                except asyncio.TimeoutError:
+                    pass
+            ResponseSigner._full.clear()
+
+            batch = ResponseSigner._pending[:MERKLE_BATCH_MAX_SIZE]
+            del ResponseSigner._pending[:MERKLE_BATCH_MAX_SIZE]
+            try:
+                envelopes = ResponseSigner._sign_batch([message for message, _ in batch])
+            except Exception as error:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(error)
+                continue
+            for (_, future), envelope in zip(batch, envelopes):
+                if not future.done():
+                    future.set_result(envelope)
+
+    @staticmethod
+    def _sign_batch(messages: List[str]) -> List[dict]:
+        start = time.perf_counter()
+        levels = build_tree([leaf_hash(message) for message in messages])
+        root = levels[-1][0].hex()
+        signature = rsa_sign(ROOT_PREFIX + root, private_server_key())
+        envelopes = [
+            {
+                "message": message,
+                "signature": signature,
+                "merkle": {"root": root, "proof": inclusion_proof(levels, index)},
+            }
+            for index, message in enumerate(messages)
+        ]
+        Metrics.observe("merkle.batch_size", len(messages))
+        Metrics.observe("merkle.sign_seconds", time.perf_counter() - start)
+        return envelopes
@@ -0,0 +1,58 @@
+# Builtins
+import threading
+from typing import Dict
+
+
+class Metrics:
+    """
+    Process-wide counters, gauges and timings, exposed by GET /metrics.
+    Safe to update from worker threads.
+    """
+    _lock = threading.Lock()
+    _counters: Dict[str, float] = {}
+    _gauges: Dict[str, float] = {}
+    _timings: Dict[str, dict] = {}
+
+    @staticmethod
+    def inc(name: str, value: float = 1):
+        with Metrics._lock:
+            Metrics._counters[name] = Metrics._counters.get(name, 0) + value
+
+    @staticmethod
+    def gauge(name: str, value: float):
+        with Metrics._lock:
+            Metrics._gauges[name] = value
+
+    @staticmethod
+    def add_gauge(name: str, delta: float):
+        with Metrics._lock:
+            Metrics._gauges[name] = Metrics._gauges.get(name, 0) + delta
+
+    @staticmethod
+    def observe(name: str, value: float):
+        with Metrics._lock:
+            timing = Metrics._timings.setdefault(
+                name, {"count": 0, "sum": 0.0, "max": 0.0}
+            )
+            timing["count"] += 1
+            timing["sum"] += value
+            timing["max"] = max(timing["max"], value)
+
+    @staticmethod
+    def snapshot() -> dict:
+        with Metrics._lock:
+            return {
+                "counters": dict(Metrics._counters),
+                "gauges": dict(Metrics._gauges),
+                "timings": {
+                    name: dict(timing, avg=timing["sum"] / timing["count"])
+                    for name, timing in Metrics._timings.items()
+                },
+            }
+
+    @staticmethod
+    def reset():
+        with Metrics._lock:
+            Metrics._counters.clear()
+            Metrics._gauges.clear()
+            Metrics._timings.clear()
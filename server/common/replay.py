@@ -0,0 +1,82 @@
+# Builtins
+import time
+from typing import Dict, Optional, Set
+
+# Internals
+from common.metrics import Metrics
+from common.utils import errorMessage
+from config.config import (
+    REPLAY_MAX_NONCES,
+    REPLAY_WINDOW_SECONDS,
+    REPLAY_BUCKET_SECONDS,
+    REPLAY_NONCE_MAX_LENGTH,
+)
+
+
+class NonceStore:
+    """
+    Nonces of the signed messages seen in the acceptance window.
+    A message is accepted once, if its issued_at is within
+    REPLAY_WINDOW_SECONDS of the server clock. Nonces are bucketed by
+    issued_at (REPLAY_BUCKET_SECONDS wide), so a lookup touches one set and
+    whole buckets are dropped once they fall out of the window. At most
+    REPLAY_MAX_NONCES are held; past that new messages are refused rather
+    than old nonces forgotten early.
+    """
+    # issued_at // REPLAY_BUCKET_SECONDS -> {(user_id, nonce)}
+    _buckets: Dict[int, Set[tuple]] = {}
+    _size = 0
+    _oldest = None
+
+    @staticmethod
+    def _expire(now: float):
+        oldest = int((now - REPLAY_WINDOW_SECONDS) // REPLAY_BUCKET_SECONDS)
+        if NonceStore._oldest is not None and oldest <= NonceStore._oldest:
+            return
+        NonceStore._oldest = oldest
+        for bucket in [b for b in NonceStore._buckets if b < oldest]:
+            NonceStore._size -= len(NonceStore._buckets.pop(bucket))
+
+    @staticmethod
+    def check(user_id: int, nonce, issued_at, now: Optional[float] = None):
+        """
+        Records (user_id, nonce), or rejects the message if it is malformed,
+        outside the window, already seen, or the store is full.
+        """
+        if now is None:
+            now = time.time()
+
+        if not isinstance(nonce, str) or not 0 < len(nonce) <= REPLAY_NONCE_MAX_LENGTH:
+            Metrics.inc("replay.rejected")
+            errorMessage(400, 52, "Missing or invalid nonce")
+        try:
+            issued_at = float(issued_at)
+        except (TypeError, ValueError):
+            Metrics.inc("replay.rejected")
+            errorMessage(400, 53, "Missing or invalid issued_at")
+        if abs(now - issued_at) > REPLAY_WINDOW_SECONDS:
+            Metrics.inc("replay.rejected")
+            errorMessage(400, 53, "Request outside the acceptance window")
+
+        NonceStore._expire(now)
+
+        key = (user_id, nonce)
+        bucket = NonceStore._buckets.get(int(issued_at // REPLAY_BUCKET_SECONDS))
+        if bucket is not None and key in bucket:
+            Metrics.inc("replay.rejected")
+            errorMessage(409, 54, "Request already processed")
+        if NonceStore._size >= REPLAY_MAX_NONCES:
+            Metrics.inc("replay.rejected")
+            errorMessage(503, 55, "Too many requests, retry later")
+
+        if bucket is None:
+            bucket = NonceStore._buckets[int(issued_at // REPLAY_BUCKET_SECONDS)] = set()
+        bucket.add(key)
+        NonceStore._size += 1
+        Metrics.gauge("replay.nonces", NonceStore._size)
+
+    @staticmethod
+    def reset():
+        NonceStore._buckets.clear()
+        NonceStore._size = 0
+        NonceStore._oldest = None
@@ -0,0 +1,94 @@
+# Builtins
+from collections import OrderedDict
+from typing import Dict, Hashable, Optional
+
+# Internals
+from common.canonical import canonical_json
+from common.encrypted import rsa_sign, private_server_key
+from common.metrics import Metrics
+from config.config import SIGNED_CACHE_SIZE
+
+
+# Version scope of the whole auction catalog (/list-auctions)
+CATALOG = "catalog"
+
+
+class SignedCache:
+    """
+    Signed {message, signature} envelopes, computed once per state version.
+    Each auction id (and CATALOG) has a monotonically increasing version,
+    bumped on every bid, cancel, edit or close. An envelope is served to
+    every reader until its version moves on.
+    Envelopes are kept in an LRU of SIGNED_CACHE_SIZE entries and dropped
+    when their auction closes; versions stay (one int per scope) so they
+    never go backwards.
+    """
+    _versions: Dict[Hashable, int] = {}
+    _entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+    _size = SIGNED_CACHE_SIZE
+    _hits = 0
+    _misses = 0
+
+    @staticmethod
+    def version(scope: Hashable) -> int:
+        return SignedCache._versions.get(scope, 0)
+
+    @staticmethod
+    def bump(*scopes: Hashable):
+        for scope in scopes:
+            SignedCache._versions[scope] = SignedCache._versions.get(scope, 0) + 1
+
+    @staticmethod
+    def drop(auction_id: int):
+        """
+        Forgets a deleted or closed auction's envelopes (its version keeps counting).
+        """
+        SignedCache.bump(auction_id, CATALOG)
+        SignedCache._entries.pop(("auction", auction_id), None)
+        SignedCache._entries.pop(("price", auction_id), None)
+
+    @staticmethod
+    def _count(hit: bool):
+        if hit:
+            SignedCache._hits += 1
+            Metrics.inc("signcache.hits")
+            Metrics.inc("signcache.rsa_avoided")
+        else:
+            SignedCache._misses += 1
+            Metrics.inc("signcache.misses")
+        total = SignedCache._hits + SignedCache._misses
+        Metrics.gauge("signcache.hit_rate", SignedCache._hits / total)
+
+    @staticmethod
+    def get(key: Hashable, version: int) -> Optional[dict]:
+        """
+        Returns the envelope signed for this exact version, or None.
+        Read `version` before reading the data the envelope is built from.
+        """
+        entry = SignedCache._entries.get(key)
+        hit = entry is not None and entry[0] == version
+        SignedCache._count(hit)
+        if not hit:
+            return None
+        SignedCache._entries.move_to_end(key)
+        return entry[1]
+
+    @staticmethod
+    def put(key: Hashable, version: int, payload) -> dict:
+        """
+        Signs the canonical JSON of payload and keeps it for `version`.
+        """
+        message = canonical_json(payload)
+        envelope = {
+            "message": message,
+            "signature": rsa_sign(message, private_server_key()),
+        }
+        entries = SignedCache._entries
+        entry = entries.get(key)
+        if entry is None or entry[0] <= version:
+            entries[key] = (version, envelope)
+            entries.move_to_end(key)
+            while len(entries) > SignedCache._size:
+                entries.popitem(last=False)
+                Metrics.inc("signcache.evictions")
+        return envelope
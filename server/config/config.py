@@ -5,3 +5,80 @@ RSA_KEYS_PATH = "rsa_key.json"
 SECRET_KEY = "testsecretkey"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
+
+# bcrypt runs in a bounded thread pool (bcrypt releases the GIL)
+PASSWORD_HASH_WORKERS = 4
+
+# Shared aiosqlite connections handed out by common.database.Database
+DB_POOL_SIZE = 8
+
+# SQLite storage profile applied at startup and on every pooled connection
+DB_PROFILE = "wal"
+DB_PROFILES = {
+    "rollback": {
+        "journal_mode": "DELETE",
+        "synchronous": "FULL",
+        "cache_size": -2000,          # KiB when negative
+        "mmap_size": 0,
+        "temp_store": "DEFAULT",
+        "busy_timeout": 5000,         # ms
+    },
+    "wal": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "cache_size": -16000,
+        "mmap_size": 256 * 1024 * 1024,
+        "temp_store": "MEMORY",
+        "busy_timeout": 5000,
+    },
+}
+
+# Server-Sent Events price stream
+PRICE_STREAM_KEEPALIVE_SECONDS = 15
+# Most auctions one stream may follow (each costs a lookup and a signature on connect)
+PRICE_STREAM_MAX_AUCTIONS = 100
+
+# /list-auctions/page
+AUCTION_PAGE_MAX_LIMIT = 200
+
+# Parsed user public keys kept by services.users.Users (LRU)
+PUBLIC_KEY_CACHE_SIZE = 4096
+
+# Signed envelopes kept by common.signcache.SignedCache (LRU)
+SIGNED_CACHE_SIZE = 10000
+
+# Per-token principal cache used by services.identity.Identity
+IDENTITY_CACHE_TTL_SECONDS = 5
+IDENTITY_CACHE_SIZE = 10000
+
+# Replay protection (common.replay.NonceStore): signed messages carry a
+# client nonce and issued_at (unix seconds) accepted within the window
+REPLAY_WINDOW_SECONDS = 60
+REPLAY_BUCKET_SECONDS = 5
+REPLAY_MAX_NONCES = 1000000
+REPLAY_NONCE_MAX_LENGTH = 64
+
+# Most bids accepted in one /bids/batch message
+BID_BATCH_MAX_SIZE = 100
+
+# /bid-history: bids per NDJSON line (one keyset query each)
+BID_HISTORY_CHUNK_SIZE = 500
+
+# Per-auction bid actors (services.bidactor.BidActors)
+BID_ACTOR_IDLE_SECONDS = 30
+BID_ACTOR_MAX_BATCH = 256
+
+# Group commit of bid inserts (services.bids.BidWriter): rows arriving
+# within the window share one transaction. A window of 0 commits each
+# write on its own.
+BID_GROUP_COMMIT_WINDOW_MS = 2
+BID_GROUP_COMMIT_MAX_ROWS = 256
+
+# Response signing (common.merkle.ResponseSigner): "rsa" signs every
+# response, "merkle" signs one Merkle root per batch window
+RESPONSE_SIGNING = "rsa"
+MERKLE_BATCH_WINDOW_MS = 5
+MERKLE_BATCH_MAX_SIZE = 1024
+
+# Hybrid RSA + AES-GCM envelopes (common.encrypted.hybrid_*): plaintext bytes per frame
+HYBRID_CHUNK_SIZE = 64 * 1024
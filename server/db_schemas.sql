@@ -53,3 +53,43 @@ CREATE TABLE Bids (
     FOREIGN KEY (auction_id) REFERENCES Auctions(id) ON DELETE CASCADE,
     FOREIGN KEY (user_id) REFERENCES UserInfo(id) ON DELETE CASCADE
 );
+
+-- =====================
+-- INDEXES
+-- =====================
+-- Hot queries are checked against these by tests/test_storage.py
+CREATE INDEX idx_bids_auction_price   ON Bids(auction_id, price DESC, id);
+CREATE INDEX idx_bids_auction_created ON Bids(auction_id, created_at);
+CREATE INDEX idx_auctions_status_end  ON Auctions(status, end_at);
+CREATE INDEX idx_images_auction       ON Images(auction_id);
+CREATE INDEX idx_auctions_end         ON Auctions(end_at);
+
+-- =====================
+-- FULL-TEXT SEARCH
+-- =====================
+-- External-content index over Auctions(title, description), kept in sync by
+-- the triggers below (create, edit of title/description, delete)
+CREATE VIRTUAL TABLE AuctionSearch USING fts5(
+    title,
+    description,
+    content='Auctions',
+    content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2'
+);
+
+CREATE TRIGGER auctions_search_insert AFTER INSERT ON Auctions BEGIN
+    INSERT INTO AuctionSearch (rowid, title, description)
+    VALUES (new.id, new.title, new.description);
+END;
+
+CREATE TRIGGER auctions_search_delete AFTER DELETE ON Auctions BEGIN
+    INSERT INTO AuctionSearch (AuctionSearch, rowid, title, description)
+    VALUES ('delete', old.id, old.title, old.description);
+END;
+
+CREATE TRIGGER auctions_search_update AFTER UPDATE OF title, description ON Auctions BEGIN
+    INSERT INTO AuctionSearch (AuctionSearch, rowid, title, description)
+    VALUES ('delete', old.id, old.title, old.description);
+    INSERT INTO AuctionSearch (rowid, title, description)
+    VALUES (new.id, new.title, new.description);
+END;
@@ -1,13 +1,20 @@
+import os
 import aiosqlite
-import asyncio
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from services.auction import Auction
+from services.bidbook import BidBook
+from services.bidactor import BidActors
+from services.bids import BidWriter
+from services.scheduler import CloseScheduler
+from common.encrypted import ServerKey, PasswordPool
+from common.database import Database, apply_profile
 
 # Routers
 from api.auction import auction_router
 from api.auth import router as auth_router
+from api.metrics import router as metrics_router
 
 from config.config import DB_PATH
 
@@ -23,10 +30,12 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag"],
 )
 
 app.include_router(auth_router)
 app.include_router(auction_router)
+app.include_router(metrics_router)
 
 
 async def init_db():
@@ -34,8 +43,13 @@ async def init_db():
         schema_sql = f.read()
     with open(DB_PATH, 'w', encoding='utf-8') as f:
         f.write('')
+    # A WAL left over from the previous run would be replayed into the new file
+    for suffix in ("-wal", "-shm"):
+        if os.path.exists(DB_PATH + suffix):
+            os.remove(DB_PATH + suffix)
 
     async with aiosqlite.connect(DB_PATH) as db:
+        await apply_profile(db)
         await db.executescript(schema_sql)
         await db.commit()
 
@@ -44,9 +58,22 @@ async def init_db():
 
 @app.on_event("startup")
 async def on_startup():
+    ServerKey.load()
+    PasswordPool.start()
     await init_db()
-    asyncio.create_task(Auction.check_auctions_status())
-    pass
+    await Database.open()
+    await BidBook.load()
+    await CloseScheduler.start(Auction.close_auctions)
+
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    await CloseScheduler.stop()
+    # queued bids are written before the pool closes
+    await BidActors.stop()
+    await BidWriter.stop()
+    await Database.close()
+    PasswordPool.shutdown()
 
 
 if __name__ == "__main__":
@@ -43,4 +43,18 @@ class CreateBidRequest(BaseModel):
     price: float
 
 class UpdatePriceRequest(BaseModel):
-    auction_id: int
\ No newline at end of file
+    auction_id: int
+
+class ListAuctionsRequest(BaseModel):
+    status: Optional[str] = None
+    min_price: Optional[float] = None
+    max_price: Optional[float] = None
+    ending_after: Optional[int] = None
+    ending_before: Optional[int] = None
+    cursor: Optional[str] = None
+    limit: int = 50
+
+class SearchAuctionsRequest(BaseModel):
+    query: str
+    limit: int = 20
+    offset: int = 0
@@ -1,14 +1,19 @@
 # Builtins
+import re
+import json
+import time
 from datetime import datetime
-from typing import Optional, List
-from threading import Thread
-import asyncio
+from typing import Dict, Optional, List, Tuple
 
 # Database
 import aiosqlite
 
 # Internals
-from config.config import DB_PATH
+from common.database import Database
+from common.signcache import SignedCache, CATALOG
+from services.bidbook import BidBook
+from services.identity import Identity
+from services.scheduler import CloseScheduler
 from schemas.auction import (
     AuctionSchema,
     EditAuctionSchema,
@@ -18,8 +23,21 @@ from schemas.auction import (
 
 
 class Auction:
+    # (auction_id, seller_id, winner_id, price) of the expired ACTIVE auctions
+    SETTLEMENT_SQL = """
+        SELECT a.id,
+               a.seller_id,
+               (SELECT b.user_id FROM Bids b WHERE b.auction_id = a.id
+                ORDER BY b.price DESC, b.id ASC LIMIT 1),
+               (SELECT MAX(b.price) FROM Bids b WHERE b.auction_id = a.id)
+        FROM Auctions a
+        WHERE a.status = 'ACTIVE'
+          AND a.end_at <= ?
+          AND (? IS NULL OR a.id IN (SELECT value FROM json_each(?)))
+    """
+
     @staticmethod
-    async def _row_to_schema(row: aiosqlite.Row) -> AuctionSchema:
+    def _row_to_schema(row: aiosqlite.Row) -> AuctionSchema:
         return AuctionSchema(
             id=row["id"],
             # seller_id=row["seller_id"],
@@ -31,6 +49,23 @@ class Auction:
             status=row["status"],
         )
 
+    @staticmethod
+    def _row_to_json(row: aiosqlite.Row) -> dict:
+        """
+        Same shape as _row_to_schema(row).model_dump(mode="json"), without
+        the model: for list paths that only serialize the rows.
+        """
+        return {
+            "id": row["id"],
+            "seller_id": None,
+            "title": row["title"],
+            "description": row["description"],
+            "base_price": row["base_price"],
+            "created_at": row["created_at"],
+            "end_at": row["end_at"],
+            "status": row["status"],
+        }
+
     @staticmethod
     async def create(data: CreateAuctionSchema) -> AuctionSchema:
         """
@@ -44,10 +79,7 @@ class Auction:
 
         created_at = int(datetime.utcnow().timestamp())
 
-        async with aiosqlite.connect(DB_PATH) as db:
-            db.row_factory = aiosqlite.Row
-            await db.execute("PRAGMA foreign_keys = ON;")
-
+        async with Database.connection() as db:
             sql = """
                 INSERT INTO Auctions (seller_id, title, description, base_price, created_at, end_at, status)
                 VALUES (?, ?, ?, ?, ?, ?, ?)
@@ -67,6 +99,9 @@ class Auction:
             await db.commit()
 
             auction_id = cursor.lastrowid
+            SignedCache.bump(auction_id, CATALOG)
+            BidBook.open_auction(auction_id)
+            CloseScheduler.schedule(auction_id, data.end_at)
 
             return AuctionSchema(
                 id=auction_id,
@@ -84,8 +119,7 @@ class Auction:
         """
         Returns AuctionShema by auction_id or None if not found.
         """
-        async with aiosqlite.connect(DB_PATH) as db:
-            db.row_factory = aiosqlite.Row
+        async with Database.connection() as db:
             sql = "SELECT * FROM Auctions WHERE id = ?"
             cursor = await db.execute(sql, (auction_id,))
             row = await cursor.fetchone()
@@ -93,7 +127,21 @@ class Auction:
         if row is None:
             return None
 
-        return await Auction._row_to_schema(row)
+        return Auction._row_to_schema(row)
+
+    @staticmethod
+    async def get_many(auction_ids: List[int]) -> Dict[int, AuctionSchema]:
+        """
+        Returns {auction_id: AuctionSchema} for the ids that exist, in one query.
+        """
+        async with Database.connection() as db:
+            cursor = await db.execute(
+                "SELECT * FROM Auctions WHERE id IN (SELECT value FROM json_each(?))",
+                (json.dumps(sorted(set(auction_ids))),),
+            )
+            rows = await cursor.fetchall()
+
+        return {row["id"]: Auction._row_to_schema(row) for row in rows}
 
     @staticmethod
     async def edit(data: EditAuctionSchema) -> Optional[AuctionSchema]:
@@ -101,10 +149,7 @@ class Auction:
         Updates auction details in the database.
         Returns updated AuctionSchema or None if auction not found.
         """
-        async with aiosqlite.connect(DB_PATH) as db:
-            db.row_factory = aiosqlite.Row
-            await db.execute("PRAGMA foreign_keys = ON;")
-
+        async with Database.connection() as db:
             sql = """
                 UPDATE Auctions
                 SET title = ?,
@@ -130,7 +175,15 @@ class Auction:
             if cursor.rowcount == 0:
                 return None
 
-        return await Auction.get_auction(data.id)
+        SignedCache.bump(data.id, CATALOG)
+        if data.status == "ACTIVE":
+            await BidBook.reload(data.id)
+            CloseScheduler.schedule(data.id, data.end_at)
+        else:
+            BidBook.close_auction(data.id)
+            CloseScheduler.cancel(data.id)
+
+        return await Auction.get(data.id)
 
     @staticmethod
     async def delete(auction_id: int) -> bool:
@@ -138,91 +191,206 @@ class Auction:
         Removes auction from the database.
         Returns True if auction was deleted, False if not found.
         """
-        async with aiosqlite.connect(DB_PATH) as db:
-            await db.execute("PRAGMA foreign_keys = ON;")
-
+        async with Database.connection() as db:
             sql = "DELETE FROM Auctions WHERE id = ?"
             cursor = await db.execute(sql, (auction_id,))
             await db.commit()
 
-            return cursor.rowcount > 0
+        SignedCache.drop(auction_id)
+        BidBook.close_auction(auction_id)
+        CloseScheduler.cancel(auction_id)
+        return cursor.rowcount > 0
 
     @staticmethod
-    async def get_all() -> List[AuctionSchema]:
+    async def get_all() -> List[dict]:
         """
-        Returns a list of all auctions.
+        Returns all auctions, as JSON-ready dicts.
         """
-        async with aiosqlite.connect(DB_PATH) as db:
-            db.row_factory = aiosqlite.Row
+        async with Database.connection() as db:
             sql = "SELECT * FROM Auctions"
             cursor = await db.execute(sql)
             rows = await cursor.fetchall()
 
-        return [await Auction._row_to_schema(row) for row in rows]
+        return [Auction._row_to_json(row) for row in rows]
     
     @staticmethod
-    async def get_auctions_user_is_in(user_id):
+    def encode_cursor(end_at: int, auction_id: int) -> str:
+        return f"{end_at}:{auction_id}"
+
+    @staticmethod
+    def decode_cursor(cursor: str) -> Tuple[int, int]:
         """
-        Returns a list of all the auctions the user is in.
+        Raises ValueError on a malformed cursor.
         """
-        async with aiosqlite.connect(DB_PATH) as db:
-            db.row_factory = aiosqlite.Row
-            sql = "SELECT * FROM Auction_Participants WHERE user_id = ?"
-            cursor = await db.execute(sql, (user_id, ))
-            rows = await cursor.fetchall()
-
-            return [await Auction._row_to_schema(row) for row in rows]
+        end_at, auction_id = cursor.split(":")
+        return int(end_at), int(auction_id)
 
     @staticmethod
-    async def auctions_status():
-        async with aiosqlite.connect(DB_PATH) as db:
-            db.row_factory = aiosqlite.Row
-            sql = "SELECT * FROM Auctions WHERE status = ?"
-            cursor = await db.execute(sql, ("ACTIVE", ))
-            rows = await cursor.fetchall()
-
-            for row in rows:
-                if row["end_at"] >= int(datetime.utcnow().timestamp()):
-                    sql_update = "UPDATE Auctions SET status = ? WHERE id = ?"
-                    await db.execute(sql_update, ("INACTIVE", row["id"], ))
-                    await db.commit()
-
-                    sql_update = "SELECT * FROM Bids WHERE id = ? ORDER BY price DESC LIMIT 1"
-                    cursor_update = await db.execute(sql_update, (row["id"], ))
-                    row_winner_bid = await cursor_update.fetchone()
-
-                    if row_winner_bid == None:
-                        continue
-
-                    final_bid = float(row_winner_bid["price"])
-
-                    sql_update = "SELECT * FROM UserInfo WHERE id = ?"
-                    cursor_update = await db.execute(sql_update, (row_winner_bid["user_id"], ))
-                    row_winner = await cursor_update.fetchone()
-
-                    winner_new_balance = float(row_winner["balance"]) - final_bid
+    async def get_page(
+        limit: int,
+        cursor: Optional[str] = None,
+        status: Optional[str] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        ending_after: Optional[int] = None,
+        ending_before: Optional[int] = None,
+    ) -> Tuple[List[AuctionSchema], Optional[str]]:
+        """
+        Returns one page of auctions ordered by (end_at, id), starting after
+        `cursor`, and the cursor of the next page (None on the last page).
+        Keyset pagination: the cost does not depend on the page number.
+        Status and end_at filters are index ranges; a price filter is
+        checked on the (end_at, id) walk, so a selective price range reads
+        every skipped auction and is not constant-time.
+        """
+        clauses, params = [], []
+        if status is not None:
+            clauses.append("status = ?")
+            params.append(status)
+        if min_price is not None:
+            clauses.append("base_price >= ?")
+            params.append(min_price)
+        if max_price is not None:
+            clauses.append("base_price <= ?")
+            params.append(max_price)
+        if ending_after is not None:
+            clauses.append("end_at > ?")
+            params.append(ending_after)
+        if ending_before is not None:
+            clauses.append("end_at < ?")
+            params.append(ending_before)
+        if cursor is not None:
+            clauses.append("(end_at, id) > (?, ?)")
+            params.extend(Auction.decode_cursor(cursor))
+
+        sql = "SELECT * FROM Auctions"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY end_at, id LIMIT ?"
+        params.append(limit + 1)
+
+        async with Database.connection() as db:
+            cursor_db = await db.execute(sql, params)
+            rows = await cursor_db.fetchall()
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = Auction.encode_cursor(rows[-1]["end_at"], rows[-1]["id"])
+
+        return [Auction._row_to_schema(row) for row in rows], next_cursor
 
-                    sql_update = "SELECT * FROM UserInfo WHERE id = ?"
-                    cursor_update = await db.execute(sql_update, (row["seller_id"], ))
-                    row_seller = await cursor_update.fetchone()
+    @staticmethod
+    def match_expression(query: str) -> Optional[str]:
+        """
+        Turns free text into a safe FTS5 expression: every word must match,
+        as a prefix. Returns None when the text has no searchable word.
+        """
+        terms = re.findall(r"\w+", query, flags=re.UNICODE)
+        if not terms:
+            return None
+        return " ".join(f'"{term}"*' for term in terms)
 
-                    seller_new_balance = float(row_seller["balance"]) + final_bid
+    @staticmethod
+    async def search(query: str, limit: int, offset: int = 0) -> List[AuctionSchema]:
+        """
+        Full-text search over title and description, best match first (bm25).
+        """
+        match = Auction.match_expression(query)
+        if match is None:
+            return []
 
-                    sql_update = "UPDATE UserInfo SET balance = ? WHERE id = ?"
-                    await db.execute(sql_update, (winner_new_balance, row_winner["id"], ))
-                    await db.commit()
+        async with Database.connection() as db:
+            # rank and LIMIT stay on the FTS table so FTS5 keeps a top-N heap
+            sql = """
+                SELECT a.* FROM (
+                    SELECT rowid, rank FROM AuctionSearch
+                    WHERE AuctionSearch MATCH ?
+                    ORDER BY rank
+                    LIMIT ? OFFSET ?
+                ) s
+                JOIN Auctions a ON a.id = s.rowid
+                ORDER BY s.rank
+            """
+            cursor = await db.execute(sql, (match, limit, offset))
+            rows = await cursor.fetchall()
 
-                    sql_update = "UPDATE UserInfo SET balance = ? WHERE id = ?"
-                    await db.execute(sql_update, (seller_new_balance, row_seller["id"], ))
-                    await db.commit()
+        return [Auction._row_to_schema(row) for row in rows]
 
-            # if active and time over -> inactive then credit seller account and debit bidder
-    
     @staticmethod
-    async def check_auctions_status():
-        while True:
-            await Auction.auctions_status()
-            await asyncio.sleep(5)
-
+    async def get_auctions_user_is_in(user_id):
+        """
+        Returns a list of all the auctions the user is in.
+        """
+        async with Database.connection() as db:
+            sql = "SELECT * FROM Auction_Participants WHERE user_id = ?"
+            cursor = await db.execute(sql, (user_id, ))
+            rows = await cursor.fetchall()
 
+            return [Auction._row_to_schema(row) for row in rows]
 
+    @staticmethod
+    async def close_auctions(auction_ids: Optional[List[int]] = None) -> List[dict]:
+        """
+        Settles expired auctions in a single transaction (called by
+        CloseScheduler at their end_at): marks them INACTIVE, debits each
+        winner and credits each seller with set-based SQL.
+        Only ACTIVE auctions past their end_at are touched, so re-running
+        it is a no-op. auction_ids=None settles every expired auction.
+        Returns the settled rows (auction_id, seller_id, winner_id, price).
+        """
+        # same clock as CloseScheduler (utcnow().timestamp() is skewed by the local offset)
+        now = int(time.time())
+        ids = json.dumps(auction_ids) if auction_ids is not None else None
+
+        async with Database.connection() as db:
+            await db.execute("""
+                CREATE TEMP TABLE IF NOT EXISTS Settlement (
+                    auction_id INTEGER PRIMARY KEY,
+                    seller_id  INTEGER NOT NULL,
+                    winner_id  INTEGER,
+                    price      REAL
+                )
+            """)
+            await db.execute("BEGIN IMMEDIATE")
+            try:
+                await db.execute("DELETE FROM temp.Settlement")
+                await db.execute(
+                    "INSERT INTO temp.Settlement (auction_id, seller_id, winner_id, price) "
+                    + Auction.SETTLEMENT_SQL,
+                    (now, ids, ids),
+                )
+
+                await db.execute("""
+                    UPDATE UserInfo
+                    SET balance = balance - (SELECT SUM(s.price) FROM temp.Settlement s
+                                             WHERE s.winner_id = UserInfo.id)
+                    WHERE id IN (SELECT winner_id FROM temp.Settlement WHERE winner_id IS NOT NULL)
+                """)
+                await db.execute("""
+                    UPDATE UserInfo
+                    SET balance = balance + (SELECT SUM(s.price) FROM temp.Settlement s
+                                             WHERE s.seller_id = UserInfo.id AND s.price IS NOT NULL)
+                    WHERE id IN (SELECT seller_id FROM temp.Settlement WHERE price IS NOT NULL)
+                """)
+                await db.execute("""
+                    UPDATE Auctions SET status = 'INACTIVE'
+                    WHERE id IN (SELECT auction_id FROM temp.Settlement)
+                """)
+
+                cursor = await db.execute(
+                    "SELECT auction_id, seller_id, winner_id, price FROM temp.Settlement"
+                )
+                settled = [dict(row) for row in await cursor.fetchall()]
+                await db.commit()
+            except Exception:
+                await db.rollback()
+                raise
+
+        for row in settled:
+            SignedCache.drop(row["auction_id"])
+            BidBook.close_auction(row["auction_id"])
+            Identity.invalidate_user(row["seller_id"])
+            if row["winner_id"] is not None:
+                Identity.invalidate_user(row["winner_id"])
+        return settled
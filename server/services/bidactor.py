@@ -0,0 +1,145 @@
+# Builtins
+import asyncio
+from typing import Dict, List, Optional
+
+# Internals
+from common.metrics import Metrics
+from config.config import BID_ACTOR_IDLE_SECONDS, BID_ACTOR_MAX_BATCH
+from schemas.bids import BidSchema, CreateBidSchema
+from services.bidbook import BidBook
+from services.bids import Bid
+
+
+class BidRejected(Exception):
+    """
+    A bid refused by its auction's actor; code/message follow errorMessage.
+    """
+    def __init__(self, code: int, message: str):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+
+
+class BidActor:
+    """
+    Owns the bid writes of one auction.
+    Bids are queued and handled strictly in arrival order by a single
+    worker: each one must beat the current highest price (read from the
+    BidBook, no query), and everything accepted from one drain of the queue
+    is written together.
+    """
+    __slots__ = ("auction_id", "queue", "task", "closing")
+
+    def __init__(self, auction_id: int):
+        self.auction_id = auction_id
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.task: Optional[asyncio.Task] = None
+        # set once the stop marker (None) is dequeued
+        self.closing = False
+
+    def _drain(self, first: tuple) -> List[tuple]:
+        batch = [first]
+        while len(batch) < BID_ACTOR_MAX_BATCH and not self.queue.empty():
+            item = self.queue.get_nowait()
+            if item is None:
+                self.closing = True
+                break
+            batch.append(item)
+        return batch
+
+    async def run(self):
+        while True:
+            try:
+                first = await asyncio.wait_for(self.queue.get(), timeout=BID_ACTOR_IDLE_SECONDS)
+            except asyncio.TimeoutError:
+                # no await between this check and the removal, so no bid can slip in
+                if self.queue.empty():
+                    BidActors._evict(self)
+                    return
+                continue
+            if first is None:
+                return
+
+            batch = self._drain(first)
+            Metrics.observe("bid_actor.batch_size", len(batch))
+            entry = BidBook.get(self.auction_id)
+            highest = entry.highest_price if entry is not None else None
+
+            accepted = []
+            for user_id, price, future in batch:
+                # a future is already done when its request was cancelled
+                if entry is None:
+                    if not future.done():
+                        future.set_exception(BidRejected(42, "Auction already finished"))
+                elif highest is not None and price <= highest:
+                    Metrics.inc("bid_actor.rejected")
+                    if not future.done():
+                        future.set_exception(BidRejected(58, "Bid must be higher than the current price"))
+                else:
+                    highest = price
+                    accepted.append((user_id, price, future))
+            if accepted:
+                await self._write(accepted)
+            if self.closing:
+                return
+
+    async def _write(self, accepted: List[tuple]):
+        try:
+            bids = await Bid.create_many([
+                (user_id, CreateBidSchema(auction_id=self.auction_id, price=price))
+                for user_id, price, _ in accepted
+            ])
+        except Exception as error:
+            for _, _, future in accepted:
+                if not future.done():
+                    future.set_exception(error)
+            return
+        for (_, _, future), bid in zip(accepted, bids):
+            if not future.done():
+                future.set_result(bid)
+
+
+class BidActors:
+    """
+    Registry of the running BidActor of each auction. An actor is started
+    by the first bid on its auction and evicted after BID_ACTOR_IDLE_SECONDS
+    without bids.
+    """
+    _actors: Dict[int, BidActor] = {}
+
+    @staticmethod
+    def submit(auction_id: int, user_id: int, price: float) -> asyncio.Future:
+        """
+        Queues a bid and returns the future of its BidSchema (or BidRejected).
+        Enqueued synchronously, so submissions keep their call order.
+        """
+        actor = BidActors._actors.get(auction_id)
+        if actor is None:
+            actor = BidActors._actors[auction_id] = BidActor(auction_id)
+            actor.task = asyncio.create_task(actor.run())
+            Metrics.gauge("bid_actor.running", len(BidActors._actors))
+        future = asyncio.get_running_loop().create_future()
+        actor.queue.put_nowait((user_id, price, future))
+        return future
+
+    @staticmethod
+    async def bid(auction_id: int, user_id: int, price: float) -> BidSchema:
+        return await BidActors.submit(auction_id, user_id, price)
+
+    @staticmethod
+    def _evict(actor: BidActor):
+        if BidActors._actors.get(actor.auction_id) is actor:
+            del BidActors._actors[actor.auction_id]
+        Metrics.gauge("bid_actor.running", len(BidActors._actors))
+
+    @staticmethod
+    async def stop():
+        """
+        Lets every actor write the bids already queued, then stops it.
+        """
+        actors = list(BidActors._actors.values())
+        BidActors._actors = {}
+        for actor in actors:
+            actor.queue.put_nowait(None)
+        await asyncio.gather(*(actor.task for actor in actors), return_exceptions=True)
+        Metrics.gauge("bid_actor.running", 0)
@@ -0,0 +1,149 @@
+# Builtins
+from typing import Dict, List, Optional
+
+# Internals
+from common.database import Database
+from services.pricefeed import PriceFeed
+
+
+class BookEntry:
+    """
+    Current state of one ACTIVE auction: its highest bid and its last bid.
+    """
+    __slots__ = (
+        "auction_id",
+        "highest_price",
+        "highest_bid_id",
+        "highest_user_id",
+        "last_bid_id",
+        "last_created_at",
+    )
+
+    def __init__(self, auction_id: int):
+        self.auction_id = auction_id
+        self.highest_price = None
+        self.highest_bid_id = None
+        self.highest_user_id = None
+        self.last_bid_id = None
+        self.last_created_at = None
+
+    def as_dict(self) -> dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class BidBook:
+    """
+    In-process bid book of every ACTIVE auction.
+    Loaded at startup from Bids, then kept up to date by Bid.create and
+    Bid.delete so price reads never touch SQLite.
+    """
+    _entries: Dict[int, BookEntry] = {}
+
+    HIGHEST_SQL = """
+        SELECT id, user_id, price FROM Bids
+        WHERE auction_id = ?
+        ORDER BY price DESC, id ASC
+        LIMIT 1
+    """
+    LAST_SQL = """
+        SELECT id, created_at FROM Bids
+        WHERE auction_id = ?
+        ORDER BY created_at DESC, id DESC
+        LIMIT 1
+    """
+
+    @staticmethod
+    async def _read_entry(db, auction_id: int) -> BookEntry:
+        entry = BookEntry(auction_id)
+
+        cursor = await db.execute(BidBook.HIGHEST_SQL, (auction_id,))
+        row = await cursor.fetchone()
+        if row is not None:
+            entry.highest_price = row["price"]
+            entry.highest_bid_id = row["id"]
+            entry.highest_user_id = row["user_id"]
+
+        cursor = await db.execute(BidBook.LAST_SQL, (auction_id,))
+        row = await cursor.fetchone()
+        if row is not None:
+            entry.last_bid_id = row["id"]
+            entry.last_created_at = row["created_at"]
+
+        return entry
+
+    @staticmethod
+    async def load():
+        """
+        Rebuilds the book from the database (startup).
+        """
+        entries = {}
+        async with Database.connection() as db:
+            cursor = await db.execute("SELECT id FROM Auctions WHERE status = ?", ("ACTIVE",))
+            rows = await cursor.fetchall()
+            for row in rows:
+                entries[row["id"]] = await BidBook._read_entry(db, row["id"])
+        BidBook._entries = entries
+
+    @staticmethod
+    async def reload(auction_id: int):
+        """
+        (Re)reads one auction from the database, e.g. after its top bid was cancelled.
+        """
+        async with Database.connection() as db:
+            entry = await BidBook._read_entry(db, auction_id)
+        previous = BidBook._entries.get(auction_id)
+        BidBook._entries[auction_id] = entry
+        if previous is not None and previous.highest_price != entry.highest_price:
+            PriceFeed.publish(auction_id, entry.highest_price)
+
+    @staticmethod
+    def open_auction(auction_id: int):
+        BidBook._entries[auction_id] = BookEntry(auction_id)
+
+    @staticmethod
+    def close_auction(auction_id: int):
+        BidBook._entries.pop(auction_id, None)
+
+    @staticmethod
+    def get(auction_id: int) -> Optional[BookEntry]:
+        return BidBook._entries.get(auction_id)
+
+    @staticmethod
+    def record_bid(auction_id: int, bid_id: int, user_id, price: float, created_at: int):
+        entry = BidBook._entries.get(auction_id)
+        if entry is None:
+            return
+        if entry.highest_price is None or price > entry.highest_price:
+            entry.highest_price = price
+            entry.highest_bid_id = bid_id
+            entry.highest_user_id = user_id
+            PriceFeed.publish(auction_id, price)
+        entry.last_bid_id = bid_id
+        entry.last_created_at = created_at
+
+    @staticmethod
+    async def check_consistency() -> List[dict]:
+        """
+        Compares every entry with the database.
+        Returns the mismatches as {"auction_id", "book", "database"}; empty when in sync.
+        """
+        mismatches = []
+        async with Database.connection() as db:
+            cursor = await db.execute("SELECT id FROM Auctions WHERE status = ?", ("ACTIVE",))
+            active = {row["id"] for row in await cursor.fetchall()}
+
+            for auction_id in active | set(BidBook._entries):
+                entry = BidBook._entries.get(auction_id)
+                expected = (
+                    await BidBook._read_entry(db, auction_id) if auction_id in active else None
+                )
+                book = entry.as_dict() if entry is not None else None
+                database = expected.as_dict() if expected is not None else None
+                if book is not None and database is not None:
+                    book["highest_user_id"] = str(book["highest_user_id"])
+                    database["highest_user_id"] = str(database["highest_user_id"])
+                if book != database:
+                    mismatches.append(
+                        {"auction_id": auction_id, "book": book, "database": database}
+                    )
+        return mismatches
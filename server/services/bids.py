@@ -4,7 +4,9 @@
 # Get auction quelque chose ou il participe ok
 # Statut de l'enchere "en cours, perdant, gagnant" ok
 # Si gagnant, debit du montant sur le compte ok 
-from typing import Optional
+import time
+import asyncio
+from typing import AsyncIterator, List, Optional, Tuple
 from datetime import datetime
 
 # Database
@@ -17,12 +19,124 @@ from schemas.bids import (
     EditBidSchema,
     GetDeleteBidSchema,
 )
-from config.config import DB_PATH
+from common.database import Database
+from common.metrics import Metrics
+from config.config import BID_GROUP_COMMIT_WINDOW_MS, BID_GROUP_COMMIT_MAX_ROWS, BID_HISTORY_CHUNK_SIZE
+from common.signcache import SignedCache
+from services.bidbook import BidBook
+
+
+class BidWriter:
+    """
+    Group commit for Bids inserts.
+    Writers queue their rows and wait; a single flush task collects
+    everything that arrives within BID_GROUP_COMMIT_WINDOW_MS (or until
+    BID_GROUP_COMMIT_MAX_ROWS are queued), inserts it with one executemany
+    in one transaction, and only after the commit hands each writer its ids.
+    """
+    INSERT_SQL = """
+        INSERT INTO Bids (auction_id, user_id, created_at, price)
+        VALUES (?, ?, ?, ?)
+    """
+
+    _pending: List[tuple] = []
+    _rows = 0
+    _full: Optional[asyncio.Event] = None
+    _task: Optional[asyncio.Task] = None
+
+    @staticmethod
+    async def _write(rows: List[tuple]) -> int:
+        """
+        Inserts rows in one transaction; returns the first new id.
+        The write lock is held from BEGIN IMMEDIATE, so the new ids are the
+        consecutive run ending at last_insert_rowid().
+        """
+        start = time.perf_counter()
+        async with Database.connection() as db:
+            await db.execute("BEGIN IMMEDIATE")
+            try:
+                await db.executemany(BidWriter.INSERT_SQL, rows)
+                cursor = await db.execute("SELECT last_insert_rowid()")
+                last_id = (await cursor.fetchone())[0]
+                await db.commit()
+            except Exception:
+                await db.rollback()
+                raise
+        Metrics.observe("bid_writer.commit_seconds", time.perf_counter() - start)
+        Metrics.observe("bid_writer.batch_rows", len(rows))
+        return last_id - len(rows) + 1
+
+    @staticmethod
+    async def insert(rows: List[tuple]) -> List[int]:
+        """
+        Queues (auction_id, user_id, created_at, price) rows and returns
+        their ids once committed.
+        """
+        if BID_GROUP_COMMIT_WINDOW_MS <= 0:
+            first_id = await BidWriter._write(rows)
+            return list(range(first_id, first_id + len(rows)))
+
+        future = asyncio.get_running_loop().create_future()
+        BidWriter._pending.append((rows, future))
+        BidWriter._rows += len(rows)
+        if BidWriter._task is None or BidWriter._task.done():
+            BidWriter._full = asyncio.Event()
+            BidWriter._task = asyncio.create_task(BidWriter._run())
+        elif BidWriter._rows >= BID_GROUP_COMMIT_MAX_ROWS:
+            BidWriter._full.set()
+        return await future
+
+    @staticmethod
+    async def stop():
+        """
+        Waits until the rows already queued are committed.
+        """
+        task = BidWriter._task
+        if task is not None:
+            await task
+            BidWriter._task = None
+
+    @staticmethod
+    async def _run():
+        while BidWriter._pending:
+            if BidWriter._rows < BID_GROUP_COMMIT_MAX_ROWS:
+                try:
+                    await asyncio.wait_for(BidWriter._full.wait(), timeout=BID_GROUP_COMMIT_WINDOW_MS / 1000)
+                except asyncio.TimeoutError:
+                    pass
+            BidWriter._full.clear()
+
+            batch = BidWriter._pending
+            BidWriter._pending = []
+            BidWriter._rows = 0
+
+            try:
+                first_id = await BidWriter._write([row for rows, _ in batch for row in rows])
+            except Exception:
+                # one bad write (e.g. a deleted auction) must not fail the others
+                await BidWriter._write_each(batch)
+                continue
+            for rows, future in batch:
+                if not future.done():
+                    future.set_result(list(range(first_id, first_id + len(rows))))
+                first_id += len(rows)
+
+    @staticmethod
+    async def _write_each(batch: List[tuple]):
+        for rows, future in batch:
+            try:
+                first_id = await BidWriter._write(rows)
+            except Exception as error:
+                if not future.done():
+                    future.set_exception(error)
+                continue
+            if not future.done():
+                future.set_result(list(range(first_id, first_id + len(rows))))
 
 
 class Bid:
     @staticmethod
-    async def _row_to_schema(row: aiosqlite.Row) -> BidSchema:
+    def _row_to_schema(row: aiosqlite.Row) -> BidSchema:
         return BidSchema(
             id=row["id"],
             auction_id=row["auction_id"],
@@ -33,41 +147,37 @@ class Bid:
 
     @staticmethod
     async def create(user_id: int, data: CreateBidSchema) -> BidSchema:
-        created_at = int(datetime.utcnow().timestamp())
+        return (await Bid.create_many([(user_id, data)]))[0]
 
-        async with aiosqlite.connect(DB_PATH) as db:
-            db.row_factory = aiosqlite.Row
-            await db.execute("PRAGMA foreign_keys = ON;")
-
-            sql = """
-                INSERT INTO Bids (auction_id, user_id, created_at, price)
-                VALUES (?, ?, ?, ?)
-            """
-            cursor = await db.execute(
-                sql,
-                (
-                    data.auction_id,
-                    user_id,
-                    created_at,
-                    data.price,
-                ),
-            )
-            await db.commit()
+    @staticmethod
+    async def create_many(bids: List[Tuple[int, CreateBidSchema]]) -> List[BidSchema]:
+        """
+        Inserts (user_id, bid) pairs in one transaction, shared with the
+        other writes of the same BidWriter window.
+        """
+        if not bids:
+            return []
+        created_at = int(datetime.utcnow().timestamp())
 
-            bid_id = cursor.lastrowid
+        bid_ids = await BidWriter.insert(
+            [(bid.auction_id, user_id, created_at, bid.price) for user_id, bid in bids]
+        )
 
-            return BidSchema(
+        created = []
+        for bid_id, (user_id, bid) in zip(bid_ids, bids):
+            SignedCache.bump(bid.auction_id)
+            BidBook.record_bid(bid.auction_id, bid_id, user_id, bid.price, created_at)
+            created.append(BidSchema(
                 id=bid_id,
-                auction_id=data.auction_id,
-                # user_id=user_id,
+                auction_id=bid.auction_id,
                 created_at=created_at,
-                price=data.price,
-            )
+                price=bid.price,
+            ))
+        return created
 
     @staticmethod
     async def get(bid_id: int) -> Optional[BidSchema]:
-        async with aiosqlite.connect(DB_PATH) as db:
-            db.row_factory = aiosqlite.Row
+        async with Database.connection() as db:
             sql = "SELECT * FROM Bids WHERE id = ?"
             cursor = await db.execute(sql, (bid_id,))
             row = await cursor.fetchone()
@@ -75,12 +185,11 @@ class Bid:
         if row is None:
             return None
 
-        return await Bid._row_to_schema(row)
+        return Bid._row_to_schema(row)
 
     @staticmethod
     async def get_last_bid(auction_id: int) -> Optional[BidSchema]:
-        async with aiosqlite.connect(DB_PATH) as db:
-            db.row_factory = aiosqlite.Row
+        async with Database.connection() as db:
             sql = "SELECT * FROM Bids WHERE auction_id = ? ORDER BY created_at DESC LIMIT 1"
             cursor = await db.execute(sql, (auction_id,))
             row = await cursor.fetchone()
@@ -88,14 +197,11 @@ class Bid:
         if row is None:
             return None
 
-        return await Bid._row_to_schema(row)
+        return Bid._row_to_schema(row)
 
     @staticmethod
     async def edit(data: EditBidSchema) -> Optional[BidSchema]:
-        async with aiosqlite.connect(DB_PATH) as db:
-            db.row_factory = aiosqlite.Row
-            await db.execute("PRAGMA foreign_keys = ON;")
-
+        async with Database.connection() as db:
             sql = """
                 UPDATE Bids
                 SET price = ?
@@ -113,35 +219,78 @@ class Bid:
             if cursor.rowcount == 0:
                 return None
 
-        return await Bid.get(data.id)
+        bid = await Bid.get(data.id)
+        if bid is not None:
+            SignedCache.bump(bid.auction_id)
+            if BidBook.get(bid.auction_id) is not None:
+                await BidBook.reload(bid.auction_id)
+        return bid
 
     @staticmethod
     async def delete(bid) -> bool:
-        async with aiosqlite.connect(DB_PATH) as db:
-            await db.execute("PRAGMA foreign_keys = ON;")
-
-            sql = "DELETE FROM Bids WHERE id = ?"
+        async with Database.connection() as db:
+            sql = "DELETE FROM Bids WHERE id = ? RETURNING auction_id"
             cursor = await db.execute(sql, (bid,))
+            rows = await cursor.fetchall()
             await db.commit()
 
-            return cursor.rowcount > 0
+        if not rows:
+            return False
+
+        auction_id = rows[0]["auction_id"]
+        SignedCache.bump(auction_id)
+        if BidBook.get(auction_id) is not None:
+            await BidBook.reload(auction_id)
+        return True
         
     @staticmethod
     async def get_highest(auction_id):
-        async with aiosqlite.connect(DB_PATH) as db:
-            db.row_factory = aiosqlite.Row
+        async with Database.connection() as db:
             sql = "SELECT MAX(price) FROM Bids WHERE auction_id = ?"
             cursor = await db.execute(sql, (auction_id, ))
             row = await cursor.fetchone()
             return row[0]
         
     @staticmethod
-    async def get_auction_bid_history(auction_id):
-        async with aiosqlite.connect(DB_PATH) as db:
-            db.row_factory = aiosqlite.Row
-            sql = "SELECT * FROM Bids ORDER BY created_at DESC WHERE auction_id = ?"
-            cursor = await db.execute(sql, (auction_id, ))
-            rows = await cursor.fetchall()
+    def _row_to_history(row: aiosqlite.Row, hide_bidders: bool) -> dict:
+        return {
+            "id": row["id"],
+            "user_id": None if hide_bidders else int(row["user_id"]),
+            "created_at": row["created_at"],
+            "price": row["price"],
+        }
 
-            return [await Bid._row_to_schema(row) for row in rows]
+    @staticmethod
+    async def get_auction_bid_history(
+        auction_id: int,
+        hide_bidders: bool,
+        chunk_size: int = BID_HISTORY_CHUNK_SIZE,
+    ) -> AsyncIterator[List[dict]]:
+        """
+        Yields the bids of an auction newest first, `chunk_size` at a time.
+        Each chunk is one keyset query on (created_at, id), and the pooled
+        connection is released between chunks, so neither memory nor a
+        connection is held for the length of the history.
+        """
+        first = """
+            SELECT id, user_id, created_at, price FROM Bids
+            WHERE auction_id = ?
+            ORDER BY created_at DESC, id DESC LIMIT ?
+        """
+        after = """
+            SELECT id, user_id, created_at, price FROM Bids
+            WHERE auction_id = ? AND (created_at, id) < (?, ?)
+            ORDER BY created_at DESC, id DESC LIMIT ?
+        """
+        sql, params = first, (auction_id, chunk_size)
+        while True:
+            async with Database.connection() as db:
+                cursor = await db.execute(sql, params)
+                rows = await cursor.fetchall()
+            if rows:
+                yield [Bid._row_to_history(row, hide_bidders) for row in rows]
+            if len(rows) < chunk_size:
+                return
+            last = rows[-1]
+            sql, params = after, (auction_id, last["created_at"], last["id"], chunk_size)
 
@@ -0,0 +1,81 @@
+# Builtins
+import asyncio
+import hashlib
+from typing import Optional
+
+# Internals
+from common.canonical import envelope_body
+from common.metrics import Metrics
+from common.signcache import SignedCache, CATALOG
+from services.auction import Auction
+
+
+class CatalogSnapshot:
+    __slots__ = ("version", "etag", "body")
+
+    def __init__(self, version: int, etag: str, body: bytes):
+        self.version = version
+        self.etag = etag
+        self.body = body
+
+
+class Catalog:
+    """
+    Signed /list-auctions body, rebuilt only when the CATALOG version moves
+    (an auction is created, edited, deleted or changes status).
+    The strong ETag is the SHA-256 of the body.
+    """
+    _snapshot: Optional[CatalogSnapshot] = None
+    # single flight: concurrent misses of one version share one rebuild
+    _rebuild: Optional[asyncio.Future] = None
+    _rebuild_version: Optional[int] = None
+
+    @staticmethod
+    def current() -> Optional[CatalogSnapshot]:
+        """
+        The snapshot if it is still up to date, without touching the database.
+        """
+        snapshot = Catalog._snapshot
+        if snapshot is not None and snapshot.version == SignedCache.version(CATALOG):
+            return snapshot
+        return None
+
+    @staticmethod
+    async def snapshot() -> CatalogSnapshot:
+        snapshot = Catalog.current()
+        if snapshot is not None:
+            Metrics.inc("catalog.hits")
+            return snapshot
+
+        version = SignedCache.version(CATALOG)
+        if Catalog._rebuild is None or Catalog._rebuild_version != version:
+            Catalog._rebuild_version = version
+            Catalog._rebuild = asyncio.ensure_future(Catalog._build(version))
+        rebuild = Catalog._rebuild
+        try:
+            # shielded: a cancelled request must not cancel the others' rebuild
+            return await asyncio.shield(rebuild)
+        finally:
+            # a failed rebuild is retried by the next miss
+            if rebuild.done() and Catalog._rebuild is rebuild:
+                Catalog._rebuild = None
+
+    @staticmethod
+    async def _build(version: int) -> CatalogSnapshot:
+        auctions = await Auction.get_all()
+        envelope = SignedCache.put(("catalog",), version, auctions)
+        body = envelope_body(envelope)
+        etag = '"' + hashlib.sha256(body).hexdigest() + '"'
+
+        snapshot = CatalogSnapshot(version, etag, body)
+        if Catalog._snapshot is None or Catalog._snapshot.version <= version:
+            Catalog._snapshot = snapshot
+        Metrics.inc("catalog.rebuilds")
+        return snapshot
+
+    @staticmethod
+    def matches(if_none_match: Optional[str], etag: str) -> bool:
+        if not if_none_match:
+            return False
+        candidates = [tag.strip() for tag in if_none_match.split(",")]
+        return "*" in candidates or etag in candidates or ("W/" + etag) in candidates
@@ -0,0 +1,124 @@
+# Builtins
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Set
+
+# Externals
+import jwt
+
+# Internals
+from common.database import Database
+from common.metrics import Metrics
+from common.utils import errorMessage
+from config.config import (
+    SECRET_KEY,
+    ALGORITHM,
+    IDENTITY_CACHE_SIZE,
+    IDENTITY_CACHE_TTL_SECONDS,
+)
+from services.users import Users
+
+
+class Principal:
+    """
+    The authenticated user of a request: id, parsed public key and a
+    balance snapshot (at most IDENTITY_CACHE_TTL_SECONDS old).
+    """
+    __slots__ = ("id", "public_key", "balance")
+
+    def __init__(self, user_id: int, public_key: dict, balance: float):
+        self.id = user_id
+        self.public_key = public_key
+        self.balance = balance
+
+
+class Identity:
+    """
+    Resolves a bearer token to a Principal with at most one query, cached
+    per token for a short TTL (never past the token's own expiry).
+    """
+    # token -> (expires_at, Principal), oldest first
+    _cache: "OrderedDict[str, tuple]" = OrderedDict()
+    # user id -> tokens cached for that user
+    _tokens: Dict[int, Set[str]] = {}
+
+    @staticmethod
+    def _decode(token: str) -> tuple:
+        try:
+            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        except jwt.ExpiredSignatureError:
+            errorMessage(401, 14, "Token expired")
+        except jwt.InvalidTokenError:
+            errorMessage(401, 15, "Invalid token")
+
+        raw_user_id = payload.get("sub") or payload.get("user_id")
+        if raw_user_id is None:
+            errorMessage(401, 16, "User id not found in token")
+
+        try:
+            user_id = int(raw_user_id)
+        except (TypeError, ValueError):
+            errorMessage(401, 17, "Invalid user id in token")
+
+        return user_id, payload.get("exp")
+
+    @staticmethod
+    async def resolve(token: str) -> Principal:
+        now = time.time()
+        entry = Identity._cache.get(token)
+        if entry is not None and entry[0] > now:
+            Metrics.inc("identity_cache.hits")
+            return entry[1]
+
+        Metrics.inc("identity_cache.misses")
+        user_id, token_expires_at = Identity._decode(token)
+
+        async with Database.connection() as db:
+            cursor = await db.execute(
+                "SELECT id, balance, public_key_e, public_key_n FROM UserInfo WHERE id = ?",
+                (user_id,),
+            )
+            row = await cursor.fetchone()
+
+        if row is None:
+            errorMessage(401, 13, "User not identified")
+
+        principal = Principal(
+            user_id,
+            Users.parse_public_key(row["public_key_e"], row["public_key_n"]),
+            row["balance"],
+        )
+
+        expires_at = now + IDENTITY_CACHE_TTL_SECONDS
+        if token_expires_at is not None:
+            expires_at = min(expires_at, float(token_expires_at))
+        Identity._forget(token)
+        Identity._cache[token] = (expires_at, principal)
+        Identity._tokens.setdefault(user_id, set()).add(token)
+        while len(Identity._cache) > IDENTITY_CACHE_SIZE:
+            Identity._forget(next(iter(Identity._cache)))
+        return principal
+
+    @staticmethod
+    def _forget(token: str):
+        entry = Identity._cache.pop(token, None)
+        if entry is None:
+            return
+        tokens = Identity._tokens.get(entry[1].id)
+        if tokens is not None:
+            tokens.discard(token)
+            if not tokens:
+                del Identity._tokens[entry[1].id]
+
+    @staticmethod
+    def invalidate_user(user_id: Optional[int] = None):
+        """
+        Drops the cached principals of one user (all users when None),
+        e.g. after a key change or a balance update.
+        """
+        if user_id is None:
+            Identity._cache.clear()
+            Identity._tokens.clear()
+            return
+        for token in Identity._tokens.pop(int(user_id), ()):
+            Identity._cache.pop(token, None)
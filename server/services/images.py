@@ -4,7 +4,8 @@ from typing import Optional, List
 import aiosqlite
 
 # Internals
-from config.config import DB_PATH, IMAGES_DIR
+from common.database import Database
+from config.config import IMAGES_DIR
 from schemas.images import (
     ImagesSchema,
     AddImageSchema,
@@ -22,7 +23,7 @@ class Image:
         return os.path.join(IMAGES_DIR, f"{image_id}.json")
 
     @staticmethod
-    async def _row_to_schema(row: aiosqlite.Row) -> ImagesSchema:
+    def _row_to_schema(row: aiosqlite.Row) -> ImagesSchema:
         return ImagesSchema(
             id=row["id"],
             auction_id=row["auction_id"],
@@ -34,10 +35,7 @@ class Image:
         """
         Creates an Image instance in database and returns it as ImagesSchema.
         """
-        async with aiosqlite.connect(DB_PATH) as db:
-            db.row_factory = aiosqlite.Row
-            await db.execute("PRAGMA foreign_keys = ON;")
-
+        async with Database.connection() as db:
             sql = """
                 INSERT INTO Images (auction_id, is_cover)
                 VALUES (?, ?)
@@ -64,8 +62,7 @@ class Image:
         """
         Get image by Id.
         """
-        async with aiosqlite.connect(DB_PATH) as db:
-            db.row_factory = aiosqlite.Row
+        async with Database.connection() as db:
             sql = "SELECT * FROM Images WHERE id = ?"
             cursor = await db.execute(sql, (image_id,))
             row = await cursor.fetchone()
@@ -73,17 +70,16 @@ class Image:
         if row is None:
             return None
 
-        return await Image._row_to_schema(row)
+        return Image._row_to_schema(row)
 
     @staticmethod
     async def get_all_by_auction(auction_id: int) -> List[ImagesSchema]:
-        async with aiosqlite.connect(DB_PATH) as db:
-            db.row_factory = aiosqlite.Row
+        async with Database.connection() as db:
             sql = "SELECT * FROM Images WHERE auction_id = ?"
             cursor = await db.execute(sql, (auction_id,))
             rows = await cursor.fetchall()
 
-        return [await Image._row_to_schema(row) for row in rows]
+        return [Image._row_to_schema(row) for row in rows]
 
     @staticmethod
     async def remove(image_id: int, delete_file: bool = True) -> bool:
@@ -92,9 +88,7 @@ class Image:
         If delete_file=True, also tries to delete the {id}.json file.
         Returns True if the record was deleted.
         """
-        async with aiosqlite.connect(DB_PATH) as db:
-            await db.execute("PRAGMA foreign_keys = ON;")
-
+        async with Database.connection() as db:
             sql = "DELETE FROM Images WHERE id = ?"
             cursor = await db.execute(sql, (image_id,))
             await db.commit()
@@ -0,0 +1,83 @@
+# Builtins
+import asyncio
+from typing import Dict, Iterable, Optional, Set
+
+# Internals
+from common.metrics import Metrics
+from common.signcache import SignedCache
+
+
+class Subscriber:
+    """
+    One open price stream. Holds only the latest pending envelope per
+    auction, so a slow reader sees coalesced updates, never a backlog.
+    """
+    __slots__ = ("auction_ids", "pending", "event")
+
+    def __init__(self, auction_ids: Iterable[int]):
+        self.auction_ids = set(auction_ids)
+        self.pending: Dict[int, dict] = {}
+        self.event = asyncio.Event()
+
+    def take(self) -> Dict[int, dict]:
+        self.event.clear()
+        pending, self.pending = self.pending, {}
+        return pending
+
+
+class PriceFeed:
+    """
+    Fans signed price updates out to price-stream subscribers.
+    Each change is signed once, whatever the number of subscribers.
+    """
+    _subscribers: Dict[int, Set[Subscriber]] = {}
+
+    @staticmethod
+    def envelope(auction_id: int, price: Optional[float], version: Optional[int] = None) -> dict:
+        """
+        Signed {message, signature} envelope, identical to /update-price.
+        Only the price is published, never the leader. Pass the auction's
+        SignedCache version read before `price` when the price came from
+        an await; otherwise the current version is used.
+        """
+        if version is None:
+            version = SignedCache.version(auction_id)
+        key = ("price", auction_id)
+        envelope = SignedCache.get(key, version)
+        if envelope is None:
+            json_response = {
+                "auction_id": auction_id,
+                "updated_price": price,
+            }
+            envelope = SignedCache.put(key, version, json_response)
+        return envelope
+
+    @staticmethod
+    def subscribe(auction_ids: Iterable[int]) -> Subscriber:
+        subscriber = Subscriber(auction_ids)
+        for auction_id in subscriber.auction_ids:
+            PriceFeed._subscribers.setdefault(auction_id, set()).add(subscriber)
+        Metrics.add_gauge("price_stream.subscribers", 1)
+        return subscriber
+
+    @staticmethod
+    def unsubscribe(subscriber: Subscriber):
+        for auction_id in subscriber.auction_ids:
+            subscribers = PriceFeed._subscribers.get(auction_id)
+            if subscribers is None:
+                continue
+            subscribers.discard(subscriber)
+            if not subscribers:
+                del PriceFeed._subscribers[auction_id]
+        Metrics.add_gauge("price_stream.subscribers", -1)
+
+    @staticmethod
+    def publish(auction_id: int, price: Optional[float]):
+        subscribers = PriceFeed._subscribers.get(auction_id)
+        if not subscribers:
+            return
+        envelope = PriceFeed.envelope(auction_id, price)
+        for subscriber in subscribers:
+            subscriber.pending[auction_id] = envelope
+            subscriber.event.set()
+        Metrics.inc("price_stream.published")
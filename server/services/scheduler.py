@@ -0,0 +1,149 @@
+# Builtins
+import json
+import time
+import heapq
+import asyncio
+from typing import Awaitable, Callable, Dict, List, Optional
+
+# Internals
+from common.database import Database
+from common.metrics import Metrics
+
+
+class CloseScheduler:
+    """
+    Closes auctions at their end_at.
+    A min-heap of (end_at, auction_id) drives a single task that sleeps
+    until the earliest deadline; stale heap entries (edited or deleted
+    auctions) are skipped lazily. Lag past the deadline is reported as
+    scheduler.lag_seconds.
+    """
+    _heap: List[tuple] = []
+    _deadlines: Dict[int, int] = {}
+    _wakeup: Optional[asyncio.Event] = None
+    _task: Optional[asyncio.Task] = None
+    _on_due: Optional[Callable[[List[int]], Awaitable[List[dict]]]] = None
+
+    @staticmethod
+    async def start(on_due: Callable[[List[int]], Awaitable[List[dict]]]):
+        """
+        Loads every ACTIVE auction and starts the close task.
+        on_due receives the ids of the auctions whose deadline has passed
+        and returns the settled rows (each with an auction_id).
+        """
+        CloseScheduler._on_due = on_due
+        CloseScheduler._heap = []
+        CloseScheduler._deadlines = {}
+        CloseScheduler._wakeup = asyncio.Event()
+
+        async with Database.connection() as db:
+            cursor = await db.execute("SELECT id, end_at FROM Auctions WHERE status = ?", ("ACTIVE",))
+            rows = await cursor.fetchall()
+        for row in rows:
+            CloseScheduler.schedule(row["id"], row["end_at"])
+
+        CloseScheduler._task = asyncio.create_task(CloseScheduler._run())
+
+    @staticmethod
+    async def stop():
+        if CloseScheduler._task is not None:
+            CloseScheduler._task.cancel()
+            try:
+                await CloseScheduler._task
+            except asyncio.CancelledError:
+                pass
+            CloseScheduler._task = None
+
+    @staticmethod
+    def schedule(auction_id: int, end_at: int):
+        """
+        Adds an auction or moves its deadline.
+        """
+        CloseScheduler._deadlines[auction_id] = end_at
+        heapq.heappush(CloseScheduler._heap, (end_at, auction_id))
+        Metrics.gauge("scheduler.pending", len(CloseScheduler._deadlines))
+        if CloseScheduler._wakeup is not None and CloseScheduler._heap[0] == (end_at, auction_id):
+            CloseScheduler._wakeup.set()
+
+    @staticmethod
+    def cancel(auction_id: int):
+        CloseScheduler._deadlines.pop(auction_id, None)
+        Metrics.gauge("scheduler.pending", len(CloseScheduler._deadlines))
+
+    @staticmethod
+    def _discard_stale():
+        heap = CloseScheduler._heap
+        while heap and CloseScheduler._deadlines.get(heap[0][1]) != heap[0][0]:
+            heapq.heappop(heap)
+
+    @staticmethod
+    def _pop_due(now: float) -> List[tuple]:
+        due = []
+        heap = CloseScheduler._heap
+        CloseScheduler._discard_stale()
+        while heap and heap[0][0] <= now:
+            end_at, auction_id = heapq.heappop(heap)
+            del CloseScheduler._deadlines[auction_id]
+            due.append((end_at, auction_id))
+            CloseScheduler._discard_stale()
+        Metrics.gauge("scheduler.pending", len(CloseScheduler._deadlines))
+        return due
+
+    @staticmethod
+    async def _reschedule_active(auction_ids: List[int]) -> int:
+        """
+        Puts back the auctions on_due did not settle that are still ACTIVE,
+        at their stored end_at. Returns how many were put back.
+        """
+        async with Database.connection() as db:
+            # by primary key: a status filter would walk every ACTIVE auction
+            cursor = await db.execute(
+                "SELECT id, end_at, status FROM Auctions WHERE id IN (SELECT value FROM json_each(?))",
+                (json.dumps(auction_ids),),
+            )
+            rows = [row for row in await cursor.fetchall() if row["status"] == "ACTIVE"]
+        for row in rows:
+            CloseScheduler.schedule(row["id"], row["end_at"])
+        return len(rows)
+
+    @staticmethod
+    async def _run():
+        wakeup = CloseScheduler._wakeup
+        while True:
+            wakeup.clear()
+            CloseScheduler._discard_stale()
+            if not CloseScheduler._heap:
+                await wakeup.wait()
+                continue
+
+            delay = CloseScheduler._heap[0][0] - time.time()
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(wakeup.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            now = time.time()
+            due = CloseScheduler._pop_due(now)
+            try:
+                settled = await CloseScheduler._on_due([auction_id for _, auction_id in due])
+                settled_ids = {row["auction_id"] for row in settled}
+                missed = [auction_id for _, auction_id in due if auction_id not in settled_ids]
+                rescheduled = await CloseScheduler._reschedule_active(missed) if missed else 0
+            except Exception:
+                Metrics.inc("scheduler.errors")
+                # put them back, the next pass retries
+                for end_at, auction_id in due:
+                    CloseScheduler.schedule(auction_id, end_at)
+                await asyncio.sleep(1)
+                continue
+
+            closed_at = time.time()
+            for end_at, auction_id in due:
+                if auction_id in settled_ids:
+                    Metrics.observe("scheduler.lag_seconds", closed_at - end_at)
+            Metrics.inc("scheduler.closed", len(settled_ids))
+            if rescheduled:
+                Metrics.inc("scheduler.rescheduled", rescheduled)
+                await asyncio.sleep(1)
@@ -1,12 +1,15 @@
 # Builtins
+from collections import OrderedDict
 from datetime import datetime
-from typing import Optional, List
+from typing import Optional, List, Tuple
 
 # Database
 import aiosqlite
 
 # Internals
-from config.config import DB_PATH
+from common.database import Database
+from common.metrics import Metrics
+from config.config import PUBLIC_KEY_CACHE_SIZE
 from schemas.users import (
     UserSchema,
     CreateUserSchema,
@@ -16,10 +19,13 @@ from schemas.users import (
 )
 
 class Users:
+    # (public_key_e, public_key_n) -> {"e": int, "n": int}, least recently used first
+    _public_keys: "OrderedDict[Tuple[str, str], dict]" = OrderedDict()
+    _public_keys_size = PUBLIC_KEY_CACHE_SIZE
+
     @staticmethod
     async def get(user_id):
-        async with aiosqlite.connect(DB_PATH) as conn:
-            conn.row_factory = aiosqlite.Row
+        async with Database.connection() as conn:
             cursor = await conn.execute("SELECT * FROM UserInfo WHERE id = ?", (user_id, ))
             row = await cursor.fetchone()
             user = UserSchema(
@@ -35,7 +41,7 @@ class Users:
 
     @staticmethod
     async def gen_user_id():
-        async with aiosqlite.connect(DB_PATH) as conn:
+        async with Database.connection() as conn:
             async with conn.execute("SELECT MAX(id) FROM UserInfo") as cursor:
                 result = await cursor.fetchone()
                 if result[0] is None:
@@ -46,7 +52,7 @@ class Users:
     
     @staticmethod
     async def user_exists(username: str):
-        async with aiosqlite.connect(DB_PATH) as conn:
+        async with Database.connection() as conn:
             async with conn.execute("SELECT * FROM UserInfo WHERE username = ?", (username,)) as cursor:
                 result = await cursor.fetchone()
                 if result is None:
@@ -56,26 +62,37 @@ class Users:
 
     @staticmethod   
     async def add_balance(user_id, amount):
-        async with aiosqlite.connect(DB_PATH) as conn:
+        async with Database.connection() as conn:
             await conn.execute("UPDATE UserInfo SET balance = balance + ? WHERE id = ?", (amount, user_id))
             await conn.commit()
 
     @staticmethod
     async def get_user_balance(user_id):
-        async with aiosqlite.connect(DB_PATH) as conn:
-            conn.row_factory = aiosqlite.Row
+        async with Database.connection() as conn:
             cursor = await conn.execute("SELECT balance FROM UserInfo WHERE id = ?", (user_id, ))
             row = await cursor.fetchone()
             return row["balance"]
         
     @staticmethod
-    async def get_user_public_key(user_id):
-        async with aiosqlite.connect(DB_PATH) as conn:
-            conn.row_factory = aiosqlite.Row
-            cursor = await conn.execute("SELECT * FROM UserInfo WHERE id = ?", (user_id, ))
-            row = await cursor.fetchone()
-            key = {
-                "e": int(row["public_key_e"]),
-                "n": int(row["public_key_n"])
-            }
+    def parse_public_key(public_key_e: str, public_key_n: str) -> dict:
+        """
+        Parsed key of a row already read, through an LRU keyed by the row's
+        (e, n), so a key replaced by /auth/login is never served stale.
+        """
+        cache_key = (public_key_e, public_key_n)
+        key = Users._public_keys.get(cache_key)
+        if key is not None:
+            Users._public_keys.move_to_end(cache_key)
+            Metrics.inc("public_key_cache.hits")
             return key
+
+        Metrics.inc("public_key_cache.misses")
+        key = {
+            "e": int(public_key_e),
+            "n": int(public_key_n)
+        }
+        if Users._public_keys_size > 0:
+            Users._public_keys[cache_key] = key
+            if len(Users._public_keys) > Users._public_keys_size:
+                Users._public_keys.popitem(last=False)
+        return key
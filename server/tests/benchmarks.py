@@ -0,0 +1,967 @@
+"""
+Micro-benchmarks for the server hot paths.
+
+Run from the server directory:
+    python tests/benchmarks.py            # every benchmark
+    python tests/benchmarks.py rsa_sign   # a single one
+"""
+import os
+import sys
+import time
+import asyncio
+import tempfile
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Crypto.Hash import SHA256
+from Crypto.PublicKey import RSA
+from Crypto.Util.number import bytes_to_long
+
+import aiosqlite
+
+from common import bigint
+from common.database import Database, apply_profile
+from config.config import DB_PROFILES
+from common.encrypted import (
+    ServerKey,
+    PasswordPool,
+    rsa_encrypt,
+    rsa_sign,
+    rsa_verify,
+    hash_password,
+    check_password,
+    check_password_async,
+)
+
+
+def _rate(fn, seconds: float = 2.0) -> float:
+    count = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        fn()
+        count += 1
+    return count / (time.perf_counter() - start)
+
+
+# ========== RSA SIGNATURE (full pow vs CRT) ==========
+
+def bench_rsa_sign():
+    """
+    Full m^d mod n against the CRT path, both on the same big-integer
+    backend so the ratio measures the CRT alone.
+    """
+    ServerKey.load()
+    private_key = ServerKey.private()
+    message = '{"auction_id":1,"updated_price":42.0}'
+    m = bytes_to_long(SHA256.new(message.encode("utf-8")).digest())
+
+    for name in bigint.BACKENDS:
+        bigint.set_backend(name)
+        before = _rate(lambda: bigint.powmod(m, private_key["d"], private_key["n"]))
+        after = _rate(lambda: rsa_sign(message, private_key))
+
+        assert rsa_sign(message, private_key) == pow(m, private_key["d"], private_key["n"])
+        print(f"{name:7s} rsa_sign  full pow : {before:10.1f} sig/s")
+        print(f"{name:7s} rsa_sign  CRT      : {after:10.1f} sig/s  (x{after / before:.2f})")
+    bigint.set_backend(bigint.BACKENDS[-1])
+
+
+# ========== BIG-INTEGER BACKENDS ==========
+
+def bench_bigint_backends():
+    message = '{"auction_id":1,"price":42.0}'
+    for bits in (1024, 2048):
+        key = RSA.generate(bits)
+        public_key = {"e": key.e, "n": key.n}
+        private_key = {
+            "d": key.d, "n": key.n, "p": key.p, "q": key.q,
+            "dP": key.d % (key.p - 1), "dQ": key.d % (key.q - 1),
+            "qInv": pow(key.q, -1, key.p),
+        }
+        digest = SHA256.new(message.encode("utf-8")).hexdigest().encode("utf-8")
+        client_signature = str(pow(bytes_to_long(digest), key.d, key.n))
+
+        for name in bigint.BACKENDS:
+            bigint.set_backend(name)
+            sign = _rate(lambda: rsa_sign(message, private_key), 1.0)
+            verify = _rate(lambda: rsa_verify(message, client_signature, public_key), 1.0)
+            encrypt = _rate(lambda: rsa_encrypt(message, public_key), 1.0)
+            print(f"{bits:5d} bits  {name:7s}  sign {sign:9.1f}/s  verify {verify:9.1f}/s  encrypt {encrypt:9.1f}/s")
+    bigint.set_backend(bigint.BACKENDS[-1])
+
+
+# ========== LOGIN STORM (bcrypt on / off the event loop) ==========
+
+async def _bid_latencies(stop: asyncio.Event, period: float = 0.005):
+    """
+    Stands in for the /bid handlers: wakes every `period` and records how
+    late the event loop let it run.
+    """
+    latencies = []
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(period)
+        latencies.append((time.perf_counter() - start - period) * 1000)
+    return latencies
+
+
+async def _login_storm(check, logins: int = 50):
+    password_hash = hash_password("testpassword123")
+    stop = asyncio.Event()
+    ticker = asyncio.create_task(_bid_latencies(stop))
+    await asyncio.sleep(0.05)
+    start = time.perf_counter()
+    await asyncio.gather(*(check("testpassword123", password_hash) for _ in range(logins)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    latencies = sorted(await ticker)
+    return elapsed, latencies
+
+
+def bench_login_storm():
+    async def blocking(password, password_hash):
+        return check_password(password, password_hash)
+
+    for name, check in (("inline", blocking), ("pool", check_password_async)):
+        elapsed, latencies = asyncio.run(_login_storm(check))
+        p99 = latencies[int(len(latencies) * 0.99) - 1] if latencies else float("nan")
+        print(
+            f"{name:6s}  50 logins in {elapsed:5.2f}s  bid lag median {statistics.median(latencies):7.2f} ms"
+            f"  p99 {p99:7.2f} ms  max {latencies[-1]:7.2f} ms"
+        )
+    PasswordPool.shutdown()
+
+
+# ========== STORAGE PROFILES (read/write concurrency) ==========
+
+async def _fresh_database(path: str, profile: str):
+    with open("db_schemas.sql", "r", encoding="utf-8") as f:
+        schema_sql = f.read()
+    async with aiosqlite.connect(path) as db:
+        await apply_profile(db, profile)
+        await db.executescript(schema_sql)
+        await db.execute(
+            "INSERT INTO UserInfo (username, password_hash, created_at) VALUES ('bench', 'x', 0)"
+        )
+        await db.execute(
+            "INSERT INTO Auctions (seller_id, title, description, base_price, created_at, end_at) VALUES (1, 'bench', 'bench', 5, 0, 0)"
+        )
+        await db.commit()
+
+
+async def _storage_profile(profile: str, seconds: float = 2.0, writers: int = 4, readers: int = 4):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        await _fresh_database(path, profile)
+        await Database.open(path, size=writers + readers, profile=profile)
+        deadline = time.perf_counter() + seconds
+        writes, read_latencies = [0], []
+
+        async def writer():
+            price = 0
+            while time.perf_counter() < deadline:
+                price += 1
+                async with Database.connection() as db:
+                    await db.execute(
+                        "INSERT INTO Bids (auction_id, user_id, created_at, price) VALUES (1, 1, 0, ?)",
+                        (price,),
+                    )
+                    await db.commit()
+                writes[0] += 1
+
+        async def reader():
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                async with Database.connection() as db:
+                    cursor = await db.execute("SELECT MAX(price) FROM Bids WHERE auction_id = 1")
+                    await cursor.fetchone()
+                read_latencies.append((time.perf_counter() - start) * 1000)
+
+        await asyncio.gather(*(writer() for _ in range(writers)), *(reader() for _ in range(readers)))
+        await Database.close()
+
+    read_latencies.sort()
+    print(
+        f"{profile:9s}  writes {writes[0] / seconds:8.1f}/s  reads {len(read_latencies) / seconds:8.1f}/s"
+        f"  read p50 {statistics.median(read_latencies):6.2f} ms"
+        f"  p99 {read_latencies[int(len(read_latencies) * 0.99) - 1]:6.2f} ms"
+    )
+
+
+def bench_storage_profiles():
+    for profile in DB_PROFILES:
+        asyncio.run(_storage_profile(profile))
+
+
+# ========== SETTLEMENT (10,000 auctions closing together) ==========
+
+async def _settlement(auctions: int, per_call: int):
+    from services.auction import Auction
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        await _fresh_database(path, "wal")
+        async with aiosqlite.connect(path) as db:
+            await db.executemany(
+                "INSERT INTO UserInfo (username, password_hash, created_at) VALUES (?, 'x', 0)",
+                [(f"user{i}",) for i in range(100)],
+            )
+            await db.executemany(
+                "INSERT INTO Auctions (seller_id, title, base_price, created_at, end_at) VALUES (?, 'bench', 5, 0, 1)",
+                [((i % 100) + 2,) for i in range(auctions)],
+            )
+            await db.executemany(
+                "INSERT INTO Bids (auction_id, user_id, created_at, price) VALUES (?, ?, 0, ?)",
+                [(a, ((a + k) % 100) + 2, 10 + k) for a in range(2, auctions + 2) for k in range(3)],
+            )
+            await db.commit()
+
+        await Database.open(path, size=2, profile="wal")
+        ids = list(range(2, auctions + 2))
+        start = time.perf_counter()
+        settled = 0
+        for i in range(0, len(ids), per_call):
+            settled += len(await Auction.close_auctions(ids[i:i + per_call]))
+        elapsed = time.perf_counter() - start
+        again = await Auction.close_auctions(ids)
+        await Database.close()
+
+    label = "one transaction" if per_call >= auctions else f"{per_call} per transaction"
+    print(f"{label:20s}  settled {settled} auctions in {elapsed * 1000:8.1f} ms  (re-run settled {len(again)})")
+
+
+def bench_settlement():
+    asyncio.run(_settlement(10_000, 10_000))
+    asyncio.run(_settlement(10_000, 1))
+
+
+# ========== PRICE STREAM (idle subscribers) ==========
+
+async def _idle_subscribers(count: int, idle_seconds: float):
+    from services.pricefeed import PriceFeed
+    from config.config import PRICE_STREAM_KEEPALIVE_SECONDS
+
+    received = [0]
+
+    async def consume(subscriber):
+        # same wait loop as the /price-stream generator
+        try:
+            while True:
+                try:
+                    await asyncio.wait_for(subscriber.event.wait(), PRICE_STREAM_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    continue
+                received[0] += len(subscriber.take())
+        finally:
+            PriceFeed.unsubscribe(subscriber)
+
+    tasks = [
+        asyncio.create_task(consume(PriceFeed.subscribe([i % 100])))
+        for i in range(count)
+    ]
+    await asyncio.sleep(0.5)
+
+    cpu, wall = time.process_time(), time.perf_counter()
+    await asyncio.sleep(idle_seconds)
+    idle_cpu = (time.process_time() - cpu) / (time.perf_counter() - wall)
+
+    start = time.perf_counter()
+    PriceFeed.publish(7, 42.0)
+    while received[0] < count // 100:
+        await asyncio.sleep(0)
+    fan_out = (time.perf_counter() - start) * 1000
+
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    print(f"{count} idle subscribers  CPU {idle_cpu * 100:5.2f}% of one core  "
+          f"one price change delivered to {count // 100} of them in {fan_out:6.2f} ms")
+
+
+def bench_price_stream():
+    ServerKey.load()
+    asyncio.run(_idle_subscribers(5000, 5.0))
+
+
+# ========== CATALOG SNAPSHOT (/list-auctions, 50k auctions) ==========
+
+async def _catalog(auctions: int, repeat: int = 200):
+    from starlette.requests import Request
+    from api.auction import list_auctions
+    from common.metrics import Metrics
+    from common.signcache import SignedCache, CATALOG
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        await _fresh_database(path, "wal")
+        async with aiosqlite.connect(path) as db:
+            await db.executemany(
+                "INSERT INTO Auctions (seller_id, title, description, base_price, created_at, end_at) "
+                "VALUES (1, ?, 'bench description', 5, 0, ?)",
+                [(f"item {i}", 2_000_000_000 + i) for i in range(auctions - 1)],
+            )
+            await db.commit()
+        await Database.open(path, size=2, profile="wal")
+
+        def request(etag=None):
+            headers = [(b"if-none-match", etag.encode())] if etag else []
+            return Request({"type": "http", "method": "GET", "path": "/list-auctions", "headers": headers})
+
+        SignedCache.bump(CATALOG)
+        start = time.perf_counter()
+        response = await list_auctions(request())
+        cold = (time.perf_counter() - start) * 1000
+        etag = response.headers["etag"]
+
+        start = time.perf_counter()
+        for _ in range(repeat):
+            await list_auctions(request())
+        warm = (time.perf_counter() - start) * 1000 / repeat
+
+        start = time.perf_counter()
+        for _ in range(repeat):
+            assert (await list_auctions(request(etag))).status_code == 304
+        not_modified = (time.perf_counter() - start) * 1000 / repeat
+
+        # concurrent misses after one bump share a single rebuild
+        SignedCache.bump(CATALOG)
+        rebuilds = Metrics.snapshot()["counters"].get("catalog.rebuilds", 0)
+        start = time.perf_counter()
+        await asyncio.gather(*(list_auctions(request()) for _ in range(50)))
+        stampede = (time.perf_counter() - start) * 1000
+        rebuilt = Metrics.snapshot()["counters"]["catalog.rebuilds"] - rebuilds
+        await Database.close()
+
+    print(f"{auctions} auctions, {len(response.body) / 1e6:.1f} MB body")
+    print(f"  rebuild (DB + rows + RSA)   : {cold:9.2f} ms")
+    print(f"  cached snapshot, 200        : {warm:9.4f} ms")
+    print(f"  If-None-Match, 304          : {not_modified:9.4f} ms")
+    print(f"  50 concurrent misses        : {stampede:9.2f} ms  ({rebuilt} rebuild)")
+
+
+def bench_catalog():
+    ServerKey.load()
+    asyncio.run(_catalog(50_000))
+
+
+# ========== KEYSET PAGINATION (page latency vs table size) ==========
+
+async def _grow_auctions(path: str, total: int, batch: int = 100_000):
+    async with aiosqlite.connect(path) as db:
+        cursor = await db.execute("SELECT COUNT(*) FROM Auctions")
+        current = (await cursor.fetchone())[0]
+        while current < total:
+            n = min(batch, total - current)
+            await db.executemany(
+                "INSERT INTO Auctions (seller_id, title, description, base_price, created_at, end_at, status) "
+                "VALUES (1, ?, 'bench description', ?, 0, ?, ?)",
+                [
+                    (f"item {i}", 5 + i % 500, 1_700_000_000 + i * 7 % 10_000_000,
+                     "ACTIVE" if i % 10 == 0 else "INACTIVE")
+                    for i in range(current, current + n)
+                ],
+            )
+            current += n
+        await db.commit()
+
+
+async def _pagination(sizes=(10_000, 100_000, 1_000_000), repeat: int = 50):
+    from services.auction import Auction
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        await _fresh_database(path, "wal")
+        for size in sizes:
+            await _grow_auctions(path, size)
+            await Database.open(path, size=2, profile="wal")
+            deep = Auction.encode_cursor(1_700_000_000 + (size // 2) * 7, 0)
+            for label, kwargs in (
+                ("first page", {}),
+                ("deep cursor", {"cursor": deep}),
+                ("ACTIVE, deep", {"cursor": deep, "status": "ACTIVE"}),
+            ):
+                start = time.perf_counter()
+                for _ in range(repeat):
+                    page, _ = await Auction.get_page(50, **kwargs)
+                elapsed = (time.perf_counter() - start) * 1000 / repeat
+                print(f"{size:9d} rows  {label:13s}  {len(page)} items  {elapsed:7.2f} ms/page")
+            await Database.close()
+
+
+def bench_pagination():
+    asyncio.run(_pagination())
+
+
+# ========== FULL-TEXT SEARCH (1M auctions) ==========
+
+WORDS = (
+    "lampe chaise table velo montre bague tableau vase livre disque guitare piano "
+    "ancien moderne rouge bleu vert bois metal cuir verre argent or rare signe "
+    "vintage collection bureau jardin cuisine salon enfant sport musique art"
+).split()
+
+
+async def _search(total: int, repeat: int = 50):
+    import random
+    from services.auction import Auction
+
+    rng = random.Random(42)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        await _fresh_database(path, "wal")
+        start = time.perf_counter()
+        async with aiosqlite.connect(path) as db:
+            for offset in range(0, total, 100_000):
+                await db.executemany(
+                    "INSERT INTO Auctions (seller_id, title, description, base_price, created_at, end_at) "
+                    "VALUES (1, ?, ?, 5, 0, 0)",
+                    [
+                        (" ".join(rng.sample(WORDS, 2)) + f" {i}", " ".join(rng.sample(WORDS, 6)))
+                        for i in range(offset, min(offset + 100_000, total))
+                    ],
+                )
+            await db.commit()
+        print(f"indexed {total} auctions in {time.perf_counter() - start:.1f} s")
+
+        await Database.open(path, size=2, profile="wal")
+        for query in ("lampe", "lampe rouge", "guitare vintage signe", "pia", "introuvable"):
+            start = time.perf_counter()
+            for _ in range(repeat):
+                results = await Auction.search(query, 20)
+            elapsed = (time.perf_counter() - start) * 1000 / repeat
+            print(f"  {query!r:26s} {len(results):3d} results  {elapsed:8.2f} ms/query")
+        await Database.close()
+
+
+def bench_search():
+    asyncio.run(_search(1_000_000, repeat=5))
+
+
+# ========== PUBLIC KEY CACHE (create_bid) ==========
+
+async def _bidder_database(path: str):
+    """
+    Fresh database with a seller (1), a bidder (2) holding `key`, and one
+    auction (1) open for a day. Returns the bidder's RSA key.
+    """
+    await _fresh_database(path, "wal")
+    key = RSA.generate(1024)
+    async with aiosqlite.connect(path) as db:
+        await db.execute(
+            "INSERT INTO UserInfo (username, password_hash, balance, created_at, public_key_e, public_key_n) "
+            "VALUES ('bidder', 'x', 1e12, 0, ?, ?)",
+            (str(key.e), str(key.n)),
+        )
+        await db.execute("UPDATE Auctions SET end_at = ? WHERE id = 1", (int(time.time()) + 86400,))
+        await db.commit()
+    return key
+
+
+def _signed_request(payload: dict, key):
+    import json
+    import uuid
+    from schemas.request import OtherRequests
+
+    payload = dict(payload, nonce=uuid.uuid4().hex, issued_at=int(time.time()))
+    message = json.dumps(payload)
+    digest = SHA256.new(message.encode("utf-8")).hexdigest().encode("utf-8")
+    return OtherRequests(message=message, signature=str(pow(bytes_to_long(digest), key.d, key.n)))
+
+
+async def _public_key_cache(repeat: int = 300):
+    from api.auction import create_bid
+    from services.bidactor import BidActors
+    from services.bidbook import BidBook
+    from services.identity import Principal
+    from services.users import Users
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        key = await _bidder_database(path)
+        await Database.open(path, size=4, profile="wal")
+        await BidBook.load()
+        price = 10
+
+        for label, size in (("uncached", 0), ("LRU cache", 4096)):
+            Users._public_keys.clear()
+            Users._public_keys_size = size
+
+            start = time.perf_counter()
+            for _ in range(repeat):
+                Users.parse_public_key(str(key.e), str(key.n))
+            lookup = (time.perf_counter() - start) * 1e6 / repeat
+
+            principal = Principal(2, Users.parse_public_key(str(key.e), str(key.n)), 1e12)
+            requests = [_signed_request({"auction_id": 1, "price": price + i}, key) for i in range(repeat)]
+            price += repeat
+            start = time.perf_counter()
+            for request in requests:
+                await create_bid(request, principal=principal)
+            bid = (time.perf_counter() - start) * 1000 / repeat
+            print(f"{label:9s}  key lookup {lookup:8.1f} us   create_bid {bid:7.3f} ms/request")
+        await BidActors.stop()
+        await Database.close()
+
+
+def bench_public_key_cache():
+    ServerKey.load()
+    asyncio.run(_public_key_cache())
+
+
+# ========== IDENTITY RESOLUTION (token -> principal) ==========
+
+async def _identity(repeat: int = 2000):
+    import services.identity as identity
+    from common.encrypted import create_access_token
+    from common.metrics import Metrics
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        await _bidder_database(path)
+        await Database.open(path, size=4, profile="wal")
+        token = create_access_token({"sub": "2"})
+
+        for label, ttl in (("uncached", 0), ("TTL cache", 5)):
+            identity.IDENTITY_CACHE_TTL_SECONDS = ttl
+            identity.Identity.invalidate_user()
+            Metrics.reset()
+
+            start = time.perf_counter()
+            for _ in range(repeat):
+                await identity.Identity.resolve(token)
+            elapsed = (time.perf_counter() - start) * 1e6 / repeat
+            queries = Metrics.snapshot()["counters"].get("identity_cache.misses", 0)
+            print(f"{label:9s}  {elapsed:8.1f} us/request   {queries / repeat:6.3f} queries/request")
+        await Database.close()
+
+
+def bench_identity():
+    asyncio.run(_identity())
+
+
+# ========== BID BATCH (/bids/batch vs /bid) ==========
+
+async def _bid_batch(auctions: int = 50, bids: int = 2000, batch: int = 100):
+    from api.auction import create_bid, create_bid_batch
+    from services.bidactor import BidActors
+    from services.bidbook import BidBook
+    from services.identity import Principal
+    from services.users import Users
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        key = await _bidder_database(path)
+        async with aiosqlite.connect(path) as db:
+            await db.executemany(
+                "INSERT INTO Auctions (seller_id, title, description, base_price, created_at, end_at, status) "
+                "VALUES (1, 'bench', 'bench', 1, 0, ?, 'ACTIVE')",
+                [(int(time.time()) + 86400,)] * (auctions - 1),
+            )
+            await db.commit()
+        await Database.open(path, size=4, profile="wal")
+        await BidBook.load()
+        principal = Principal(2, Users.parse_public_key(str(key.e), str(key.n)), 1e12)
+
+        singles = [_signed_request({"auction_id": i % auctions + 1, "price": 10 + i}, key) for i in range(bids)]
+        start = time.perf_counter()
+        for request in singles:
+            await create_bid(request, principal=principal)
+        single = bids / (time.perf_counter() - start)
+
+        batches = [
+            _signed_request({"bids": [
+                {"auction_id": i % auctions + 1, "price": 10 + bids + i} for i in range(first, first + batch)
+            ]}, key)
+            for first in range(0, bids, batch)
+        ]
+        start = time.perf_counter()
+        for request in batches:
+            await create_bid_batch(request, principal=principal)
+        batched = bids / (time.perf_counter() - start)
+
+        print(f"/bid         {single:9.0f} bids/s")
+        print(f"/bids/batch  {batched:9.0f} bids/s  (batches of {batch}, x{batched / single:.1f})")
+        await BidActors.stop()
+        await Database.close()
+
+
+def bench_bid_batch():
+    ServerKey.load()
+    asyncio.run(_bid_batch())
+
+
+# ========== HOT AUCTION (1,000 concurrent bidders) ==========
+
+async def _hot_auction(bidders: int = 1000):
+    from schemas.bids import CreateBidSchema
+    from services.bidactor import BidActors
+    from services.bidbook import BidBook
+    from services.bids import Bid
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        await _bidder_database(path)
+        await Database.open(path, size=8, profile="wal")
+        await BidBook.load()
+
+        start = time.perf_counter()
+        await asyncio.gather(*(
+            Bid.create(2, CreateBidSchema(auction_id=1, price=10 + i)) for i in range(bidders)
+        ))
+        direct = bidders / (time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(
+            BidActors.submit(1, 2, 10 + bidders + i) for i in range(bidders)
+        ))
+        actor = bidders / (time.perf_counter() - start)
+
+        print(f"Bid.create (unordered)  {direct:8.0f} bids/s")
+        print(f"BidActor   (ordered)    {actor:8.0f} bids/s")
+        await BidActors.stop()
+        await Database.close()
+
+
+def bench_hot_auction():
+    asyncio.run(_hot_auction())
+
+
+# ========== GROUP COMMIT (concurrent bid inserts) ==========
+
+async def _group_commit(bids: int = 4000, concurrency: int = 200):
+    import services.bids as bids_module
+    from common.metrics import Metrics
+    from schemas.bids import CreateBidSchema
+    from services.bids import Bid
+
+    for profile in ("wal", "rollback"):
+        for label, window in (("per-bid commit", 0), ("group commit 2 ms", 2)):
+            bids_module.BID_GROUP_COMMIT_WINDOW_MS = window
+            Metrics.reset()
+            with tempfile.TemporaryDirectory() as tmp:
+                path = os.path.join(tmp, "bench.db")
+                await _bidder_database(path)
+                await Database.open(path, size=8, profile=profile)
+
+                async def bidder(worker: int):
+                    for i in range(worker, bids, concurrency):
+                        await Bid.create(2, CreateBidSchema(auction_id=1, price=10 + i))
+
+                start = time.perf_counter()
+                await asyncio.gather(*(bidder(worker) for worker in range(concurrency)))
+                rate = bids / (time.perf_counter() - start)
+                await Database.close()
+
+            timings = Metrics.snapshot()["timings"]
+            rows = timings["bid_writer.batch_rows"]
+            commit = timings["bid_writer.commit_seconds"]
+            print(f"{profile:8s} {label:18s} {rate:8.0f} bids/s   "
+                  f"{rows['avg']:6.1f} rows/commit   {commit['avg'] * 1000:6.2f} ms/commit")
+
+
+def bench_group_commit():
+    asyncio.run(_group_commit())
+
+
+# ========== MERKLE SIGNING (responses/s vs batch window) ==========
+
+async def _merkle(window_ms, clients: int = 500, seconds: float = 2.0) -> float:
+    from common import merkle
+
+    merkle.RESPONSE_SIGNING = "rsa" if window_ms is None else "merkle"
+    merkle.MERKLE_BATCH_WINDOW_MS = window_ms or 0
+    message = '{"auction_id":1,"created_at":1700000000,"id":42,"price":12.5,"user_id":null}'
+    done = 0
+    deadline = time.perf_counter() + seconds
+
+    async def client():
+        nonlocal done
+        while time.perf_counter() < deadline:
+            await merkle.ResponseSigner.sign(message)
+            done += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(clients)))
+    return done / (time.perf_counter() - start)
+
+
+def bench_merkle():
+    from common.metrics import Metrics
+
+    ServerKey.load()
+    for window_ms in (None, 1, 2, 5, 10):
+        Metrics.reset()
+        rate = asyncio.run(_merkle(window_ms))
+        label = "rsa per response" if window_ms is None else f"merkle {window_ms:>2} ms"
+        batch = Metrics.snapshot()["timings"].get("merkle.batch_size", {}).get("avg", 1)
+        print(f"{label:17s} {rate:9.0f} responses/s   {batch:7.1f} per signature")
+
+
+# ========== HYBRID ENVELOPE (RSA + AES-GCM throughput) ==========
+
+def bench_hybrid(megabytes: int = 64):
+    from common.encrypted import (
+        hybrid_encrypt_stream,
+        hybrid_decrypt_stream,
+        public_server_key,
+        private_server_key,
+    )
+
+    ServerKey.load()
+    public_key, private_key = public_server_key(), private_server_key()
+    block = os.urandom(1 << 20)
+    size = megabytes * len(block)
+
+    for chunk_size in (16 * 1024, 64 * 1024, 1024 * 1024):
+        start = time.perf_counter()
+        frames = list(hybrid_encrypt_stream((block for _ in range(megabytes)), public_key, chunk_size))
+        encrypt = size / (time.perf_counter() - start) / 2**20
+
+        start = time.perf_counter()
+        for _ in hybrid_decrypt_stream(iter(frames), private_key):
+            pass
+        decrypt = size / (time.perf_counter() - start) / 2**20
+        print(f"frames of {chunk_size // 1024:5d} KiB   encrypt {encrypt:7.0f} MB/s   decrypt {decrypt:7.0f} MB/s")
+
+
+# ========== CANONICAL SERIALIZATION (per endpoint) ==========
+
+def bench_canonical(repeat: int = 200):
+    import json
+    from fastapi.encoders import jsonable_encoder
+    from fastapi.responses import JSONResponse
+    from common import canonical
+
+    auction = {
+        "id": 7, "seller_id": None, "title": "Lampe de bureau", "description": "une lampe ancienne",
+        "base_price": 10.0, "created_at": 1700000000, "end_at": 1700003600, "status": "ACTIVE",
+    }
+    bid = {"id": 1, "auction_id": 7, "user_id": None, "created_at": 1700000000, "price": 12.5}
+    payloads = {
+        "/get-auction": auction,
+        "/bid": bid,
+        "/bids/batch (100)": {"results": [{"index": i, "status": "OK", "bid": bid} for i in range(100)]},
+        "/list-auctions/page (50)": {
+            "auctions": [dict(auction, id=i) for i in range(50)],
+            "cursor": None, "next_cursor": "1700003600:50", "filters": {},
+        },
+        "/list-auctions (10k)": [dict(auction, id=i) for i in range(10_000)],
+    }
+    signature = 3 ** 1290
+
+    def before(payload):
+        message = json.dumps(payload, separators=(",", ":"), sort_keys=True)
+        return JSONResponse(content=jsonable_encoder({"message": message, "signature": signature})).body
+
+    def after(payload):
+        message = canonical.canonical_json(payload)
+        return canonical.envelope_body({"message": message, "signature": signature})
+
+    for name, payload in payloads.items():
+        assert before(payload) == after(payload), name
+        count = max(1, repeat // (1 + len(json.dumps(payload)) // 100_000))
+        timings = []
+        for fn in (before, after):
+            start = time.perf_counter()
+            for _ in range(count):
+                fn(payload)
+            timings.append((time.perf_counter() - start) * 1e6 / count)
+        print(f"{name:26s} json+JSONResponse {timings[0]:9.1f} us   canonical {timings[1]:9.1f} us   "
+              f"x{timings[0] / timings[1]:.1f}")
+
+
+# ========== ROW MAPPING (100k rows -> response dicts) ==========
+
+def bench_row_mapping(rows: int = 100_000):
+    """
+    Maps `rows` Auctions and Bids rows to what the endpoints serialize:
+    the former async mappers, the synchronous ones, and (auctions, the
+    unbounded catalog path) plain dicts straight from the row.
+    """
+    import sqlite3
+    from schemas.auction import AuctionSchema
+    from schemas.bids import BidSchema
+    from services.auction import Auction
+    from services.bids import Bid
+
+    db = sqlite3.connect(":memory:")
+    db.row_factory = sqlite3.Row
+    with open("db_schemas.sql") as f:
+        db.executescript(f.read())
+    db.execute("INSERT INTO UserInfo (id, username, password_hash, created_at) VALUES (1, 'seller', '', 0)")
+    db.executemany(
+        "INSERT INTO Auctions (id, seller_id, title, description, base_price, created_at, end_at, status) "
+        "VALUES (?, 1, ?, ?, ?, ?, ?, 'ACTIVE')",
+        [(i, f"lot {i}", "description", 10.0 + i, 1_700_000_000, 1_700_003_600 + i) for i in range(1, rows + 1)],
+    )
+    db.executemany(
+        "INSERT INTO Bids (auction_id, user_id, created_at, price) VALUES (?, 1, ?, ?)",
+        [(1 + i % 100, 1_700_000_000 + i, 11.0 + i) for i in range(rows)],
+    )
+    auctions = db.execute("SELECT * FROM Auctions").fetchall()
+    bids = db.execute("SELECT * FROM Bids").fetchall()
+    db.close()
+
+    async def auction_before(row):
+        return AuctionSchema(
+            id=row["id"], title=row["title"], description=row["description"],
+            base_price=row["base_price"], created_at=row["created_at"],
+            end_at=row["end_at"], status=row["status"],
+        )
+
+    async def bid_before(row):
+        return BidSchema(
+            id=row["id"], auction_id=row["auction_id"], user_id=row["user_id"],
+            created_at=row["created_at"], price=row["price"],
+        )
+
+    async def mapped(mapper, fetched):
+        return [(await mapper(row)).model_dump(mode="json") for row in fetched]
+
+    def timed(fn):
+        start = time.perf_counter()
+        result = fn()
+        return result, (time.perf_counter() - start) * 1e3
+
+    cases = [
+        ("Auctions", auctions, auction_before, Auction._row_to_schema, Auction._row_to_json),
+        ("Bids", bids, bid_before, Bid._row_to_schema, None),
+    ]
+    for name, fetched, before, mapper, to_json in cases:
+        expected, elapsed_before = timed(lambda: asyncio.run(mapped(before, fetched)))
+        result, elapsed_sync = timed(lambda: [mapper(row).model_dump(mode="json") for row in fetched])
+        assert result == expected
+        line = f"{name:9s} {len(fetched)} rows   async {elapsed_before:7.1f} ms   sync {elapsed_sync:7.1f} ms"
+        if to_json is not None:
+            result, elapsed_json = timed(lambda: [to_json(row) for row in fetched])
+            assert result == expected
+            line += f"   row->dict {elapsed_json:7.1f} ms   x{elapsed_before / elapsed_json:.1f}"
+        print(line)
+
+
+# ========== BID HISTORY (NDJSON stream, memory vs history size) ==========
+
+async def _bid_history(sizes=(10_000, 100_000, 1_000_000)):
+    import hashlib
+    import tracemalloc
+    from common.canonical import canonical_json
+    from services.bids import Bid
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        await _fresh_database(path, "wal")
+        current = 0
+        for size in sizes:
+            async with aiosqlite.connect(path) as db:
+                await db.executemany(
+                    "INSERT INTO Bids (auction_id, user_id, created_at, price) VALUES (1, 1, ?, ?)",
+                    [(1_700_000_000 + i // 10, 5.0 + i) for i in range(current, size)],
+                )
+                await db.commit()
+            current = size
+            await Database.open(path, size=2, profile="wal")
+
+            # what /bid-history does per chunk, without the HTTP layer
+            tracemalloc.start()
+            start = time.perf_counter()
+            digest, count, sent = hashlib.sha256(), 0, 0
+            async for bids in Bid.get_auction_bid_history(1, hide_bidders=True):
+                line = (canonical_json({"bids": bids}) + "\n").encode("utf-8")
+                digest.update(line)
+                count += len(bids)
+                sent += len(line)
+            elapsed = time.perf_counter() - start
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            assert count == size
+
+            # the former shape: every row fetched and mapped at once
+            tracemalloc.start()
+            async with Database.connection() as db:
+                cursor = await db.execute(
+                    "SELECT * FROM Bids WHERE auction_id = ? ORDER BY created_at DESC", (1,)
+                )
+                everything = [Bid._row_to_schema(row) for row in await cursor.fetchall()]
+            _, peak_all = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            del everything
+
+            await Database.close()
+            print(f"{size:9d} bids  {count / elapsed:9.0f} bids/s  {sent / 2**20:7.1f} MiB sent   "
+                  f"peak stream {peak / 2**20:6.1f} MiB   fetchall {peak_all / 2**20:7.1f} MiB")
+
+
+def bench_bid_history():
+    asyncio.run(_bid_history())
+
+
+# ========== REPLAY STORE (10k signed requests per second) ==========
+
+def _replay_run(rate: int, seconds: int) -> float:
+    from common.replay import NonceStore
+
+    NonceStore.reset()
+    elapsed = 0.0
+    for second in range(seconds):
+        now = 1_700_000_000 + second
+        nonces = [os.urandom(16).hex() for _ in range(rate)]
+        start = time.perf_counter()
+        for i, nonce in enumerate(nonces):
+            NonceStore.check(i, nonce, now, now=now)
+        elapsed += time.perf_counter() - start
+        del nonces
+    return elapsed
+
+
+def bench_replay(rate: int = 10000, seconds: int = 300):
+    """
+    Feeds the nonce store `rate` requests per simulated second for
+    `seconds` (the steady state holds window + bucket seconds of nonces).
+    Timed once, then replayed under tracemalloc for the memory held.
+    """
+    import tracemalloc
+    from common.replay import NonceStore
+
+    elapsed = _replay_run(rate, seconds)
+    tracemalloc.start()
+    _replay_run(rate, seconds)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    checks = rate * seconds
+    print(f"{checks} checks  {elapsed * 1e9 / checks:6.0f} ns/check  "
+          f"{NonceStore._size} nonces held  {current / 2**20:6.1f} MiB "
+          f"({current / NonceStore._size:4.0f} B/nonce)")
+    NonceStore.reset()
+
+
+BENCHMARKS = {
+    "rsa_sign": bench_rsa_sign,
+    "bigint": bench_bigint_backends,
+    "login_storm": bench_login_storm,
+    "storage_profiles": bench_storage_profiles,
+    "settlement": bench_settlement,
+    "price_stream": bench_price_stream,
+    "catalog": bench_catalog,
+    "pagination": bench_pagination,
+    "search": bench_search,
+    "public_key_cache": bench_public_key_cache,
+    "identity": bench_identity,
+    "replay": bench_replay,
+    "bid_batch": bench_bid_batch,
+    "hot_auction": bench_hot_auction,
+    "group_commit": bench_group_commit,
+    "merkle": bench_merkle,
+    "hybrid": bench_hybrid,
+    "canonical": bench_canonical,
+    "row_mapping": bench_row_mapping,
+    "bid_history": bench_bid_history,
+}
+
+
+if __name__ == "__main__":
+    os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    names = sys.argv[1:] or list(BENCHMARKS)
+    for name in names:
+        print(f"=== {name} ===")
+        BENCHMARKS[name]()
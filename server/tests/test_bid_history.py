@@ -0,0 +1,120 @@
+import asyncio
+import hashlib
+import json
+import sqlite3
+import time
+import uuid
+
+import pytest
+from Crypto.Hash import SHA256
+from Crypto.PublicKey import RSA
+from Crypto.Util.number import bytes_to_long
+
+from api.auction import bid_history
+from common.database import Database
+from common.encrypted import ServerKey
+from common.merkle import verify_envelope
+from schemas.auction import CreateAuctionSchema
+from schemas.bids import CreateBidSchema
+from schemas.request import OtherRequests
+from services.auction import Auction
+from services.bidbook import BidBook
+from services.bids import Bid
+from services.identity import Principal
+
+
+@pytest.fixture
+def pool(tmp_path):
+    path = str(tmp_path / "test.db")
+    conn = sqlite3.connect(path)
+    with open("db_schemas.sql", "r", encoding="utf-8") as f:
+        conn.executescript(f.read())
+    conn.executemany(
+        "INSERT INTO UserInfo (username, password_hash, balance, created_at) VALUES (?, 'x', 1000, 0)",
+        [("seller",), ("alice",), ("bobby",)],
+    )
+    conn.commit()
+    conn.close()
+    return path
+
+
+def _signed(payload: dict, key) -> OtherRequests:
+    payload = dict(payload, nonce=uuid.uuid4().hex, issued_at=int(time.time()))
+    message = json.dumps(payload)
+    digest = SHA256.new(message.encode("utf-8")).hexdigest().encode("utf-8")
+    return OtherRequests(message=message, signature=str(pow(bytes_to_long(digest), key.d, key.n)))
+
+
+def verify_history(body: bytes, server_key: dict) -> dict:
+    """
+    Client-side check of a /bid-history stream: the last line is a signed
+    summary whose SHA-256 covers every byte before it. Returns the summary
+    and the bids, or raises AssertionError.
+    """
+    assert body.endswith(b"\n")
+    head, _, last = body[:-1].rpartition(b"\n")
+    head = head + b"\n" if head else b""
+    envelope = json.loads(last)
+    assert set(envelope) >= {"message", "signature"}
+    assert verify_envelope(envelope, server_key)
+    summary = json.loads(envelope["message"])
+    assert hashlib.sha256(head).hexdigest() == summary["sha256"]
+    bids = [bid for line in head.splitlines() for bid in json.loads(line)["bids"]]
+    assert len(bids) == summary["count"]
+    return {"summary": summary, "bids": bids}
+
+
+def test_bid_history_stream_is_signed_and_complete(pool):
+    ServerKey.load()
+    server_key = ServerKey.public()
+    key = RSA.generate(1024)
+    principal = Principal(2, {"e": key.e, "n": key.n}, 1000)
+
+    async def read(auction_id):
+        response = await bid_history(_signed({"auction_id": auction_id}, key), principal=principal)
+        assert response.media_type == "application/x-ndjson"
+        return b"".join([chunk async for chunk in response.body_iterator])
+
+    async def scenario():
+        await Database.open(pool, size=2)
+        try:
+            await BidBook.load()
+            auction = await Auction.create(
+                CreateAuctionSchema(seller_id=1, title="Lampe", description="une lampe", base_price=5, end_at=2**31)
+            )
+            # more than one BID_HISTORY_CHUNK_SIZE, so several NDJSON lines
+            await Bid.create_many(
+                [(2 + i % 2, CreateBidSchema(auction_id=auction.id, price=10 + i)) for i in range(1100)]
+            )
+            active = await read(auction.id)
+
+            async with Database.connection() as db:
+                await db.execute("UPDATE Auctions SET status = 'INACTIVE' WHERE id = ?", (auction.id,))
+                await db.commit()
+            closed = await read(auction.id)
+            return auction.id, active, closed
+        finally:
+            await Database.close()
+
+    auction_id, active, closed = asyncio.run(scenario())
+
+    history = verify_history(active, server_key)
+    assert len(active.splitlines()) > 2
+    summary = history["summary"]
+    assert (summary["auction_id"], summary["bidders_hidden"], summary["count"]) == (auction_id, True, 1100)
+    assert [bid["price"] for bid in history["bids"]] == [10.0 + i for i in reversed(range(1100))]
+    assert {bid["user_id"] for bid in history["bids"]} == {None}
+
+    history = verify_history(closed, server_key)
+    assert history["summary"]["bidders_hidden"] is False
+    assert {bid["user_id"] for bid in history["bids"]} == {2, 3}
+
+    lines = active.splitlines(keepends=True)
+    truncated = [
+        b"".join(lines[:-1]),              # summary line lost
+        b"".join(lines[1:]),               # first chunk lost
+        active[: len(active) // 2],        # cut mid-line
+    ]
+    for body in truncated:
+        with pytest.raises((AssertionError, ValueError)):
+            verify_history(body, server_key)
@@ -0,0 +1,69 @@
+import json
+import random
+
+import pytest
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from common import canonical
+from common.canonical import canonical_json, envelope_body
+
+
+AUCTION = {
+    "id": 7, "seller_id": None, "title": "Lampe de bureau", "description": "une lampe",
+    "base_price": 10.0, "created_at": 1700000000, "end_at": 1700003600, "status": "ACTIVE",
+}
+
+CORPUS = [
+    AUCTION,
+    [AUCTION, dict(AUCTION, id=8, title="Chaise")],
+    {"auctions": [AUCTION], "cursor": None, "next_cursor": "1700003600:7", "filters": {"status": "ACTIVE"}},
+    {"results": [{"index": 0, "status": "OK", "bid": {"id": 1, "price": 12.5}},
+                 {"index": 1, "status": "ERROR", "code": 47, "message": "Insufficient credit"}]},
+    {"status": "OK", "message": "Le montant a bien été crédité"},
+    {"pseudo": "😀 émoji", "quote": "\"'\\/", "control": "\x00\x1f\x7f\t\n", "bom": "﻿"},
+    {"e": 65537, "n": 2 ** 2048 - 1, "big": -(2 ** 70), "edge": 2 ** 63, "small": -(2 ** 63)},
+    {"floats": [0.0, -0.0, 1.0, 0.1, 1e-4, 1e-5, 2.5e-7, 1e15, 1e16, 1.5e17, 1e300, 5e-324, 123.456]},
+    {"b": True, "a": False, "c": None, "": "", "Z": 1, "é": 2, "z": [[], {}]},
+    {"balance": 1e12, "price": 99999999999999.99},
+]
+
+
+def _random_payload(rng, depth=0):
+    kind = rng.randrange(6 if depth < 3 else 4)
+    if kind == 0:
+        return rng.choice([rng.uniform(-1e6, 1e6), 10 ** rng.uniform(-8, 20), rng.random()])
+    if kind == 1:
+        return rng.randrange(-2 ** 80, 2 ** 80)
+    if kind == 2:
+        return "".join(chr(rng.choice([rng.randrange(32, 127), rng.randrange(0, 0x3000)])) for _ in range(rng.randrange(8)))
+    if kind == 3:
+        return rng.choice([None, True, False])
+    if kind == 4:
+        return [_random_payload(rng, depth + 1) for _ in range(rng.randrange(4))]
+    return {f"k{rng.randrange(100)}": _random_payload(rng, depth + 1) for _ in range(rng.randrange(4))}
+
+
+def _reference(payload):
+    return json.dumps(payload, separators=(",", ":"), sort_keys=True)
+
+
+@pytest.mark.parametrize("use_orjson", [True, False])
+def test_canonical_json_matches_json_dumps(monkeypatch, use_orjson):
+    if not use_orjson:
+        monkeypatch.setattr(canonical, "orjson", None)
+    rng = random.Random(42)
+    corpus = CORPUS + [_random_payload(rng) for _ in range(2000)]
+    for payload in corpus:
+        assert canonical_json(payload) == _reference(payload), payload
+
+
+def test_envelope_body_matches_json_response():
+    for payload in CORPUS:
+        message = canonical_json(payload)
+        for envelope in (
+            {"message": message, "signature": 3 ** 1200},
+            {"message": message, "signature": 3 ** 1200,
+             "merkle": {"root": "ab" * 32, "proof": [("L", "cd" * 32), ("R", "ef" * 32)]}},
+        ):
+            assert envelope_body(envelope) == JSONResponse(content=jsonable_encoder(envelope)).body
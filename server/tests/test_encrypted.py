@@ -0,0 +1,121 @@
+import pytest
+from Crypto.Hash import SHA256
+from Crypto.PublicKey import RSA
+from Crypto.Util.number import bytes_to_long
+
+from common import bigint
+from common.encrypted import rsa_decrypt, rsa_encrypt, rsa_sign, rsa_verify
+
+
+MESSAGES = ['{"auction_id":1,"updated_price":42.0}', "pseudo", "é" * 40]
+
+
+@pytest.fixture(scope="module", params=[1024, 2048])
+def keys(request):
+    key = RSA.generate(request.param)
+    public_key = {"e": key.e, "n": key.n}
+    private_key = {"e": key.e, "d": key.d, "n": key.n}
+    crt_key = {
+        "e": key.e,
+        "d": key.d,
+        "n": key.n,
+        "p": key.p,
+        "q": key.q,
+        "dP": key.d % (key.p - 1),
+        "dQ": key.d % (key.q - 1),
+        "qInv": pow(key.q, -1, key.p),
+    }
+    return public_key, private_key, crt_key
+
+
+def _client_signature(message, private_key):
+    m = bytes_to_long(SHA256.new(message.encode("utf-8")).hexdigest().encode("utf-8"))
+    return str(pow(m, private_key["d"], private_key["n"]))
+
+
+def _run_primitives(public_key, private_key, crt_key):
+    out = []
+    for message in MESSAGES:
+        out.append(repr(rsa_sign(message, private_key)))
+        out.append(repr(rsa_sign(message, crt_key)))
+        out.append(repr(rsa_verify(message, _client_signature(message, private_key), public_key)))
+        cipher = rsa_encrypt(message, public_key)
+        out.append(repr(cipher))
+        out.append(repr(rsa_decrypt(int(cipher), private_key)))
+        out.append(repr(rsa_decrypt(int(cipher), crt_key)))
+    return out
+
+
+def test_backends_are_byte_identical(keys):
+    previous = bigint.get_backend()
+    try:
+        outputs = {}
+        for name in bigint.BACKENDS:
+            bigint.set_backend(name)
+            outputs[name] = _run_primitives(*keys)
+    finally:
+        bigint.set_backend(previous)
+
+    reference = outputs["python"]
+    assert "True" in reference and "False" not in reference
+    for name, output in outputs.items():
+        assert output == reference, name
+
+
+def test_unknown_backend_is_rejected():
+    with pytest.raises(ValueError):
+        bigint.set_backend("nope")
+
+
+def test_merkle_envelopes_verify(monkeypatch):
+    import asyncio
+    from common import merkle
+    from common.encrypted import ServerKey, public_server_key
+
+    ServerKey.load()
+    monkeypatch.setattr(merkle, "RESPONSE_SIGNING", "merkle")
+    public_key = {k: int(v) for k, v in public_server_key().items()}
+
+    async def sign_all(messages):
+        return await asyncio.gather(*(merkle.ResponseSigner.sign(m) for m in messages))
+
+    for size in (1, 2, 3, 7, 8, 9):
+        messages = [f'{{"id":{i}}}' for i in range(size)]
+        envelopes = asyncio.run(sign_all(messages))
+        assert len({e["merkle"]["root"] for e in envelopes}) == 1
+        assert all(merkle.verify_envelope(e, public_key) for e in envelopes)
+
+        forged = dict(envelopes[0], message='{"id":-1}')
+        assert not merkle.verify_envelope(forged, public_key)
+
+
+def test_hybrid_envelope_roundtrip(keys):
+    from common.encrypted import hybrid_decrypt, hybrid_decrypt_stream, hybrid_encrypt, hybrid_encrypt_stream
+
+    public_key, private_key, crt_key = keys
+    message = "enchère scellée " * 500
+    assert rsa_encrypt(message, public_key) is None
+    assert hybrid_decrypt(hybrid_encrypt(message, public_key), crt_key).decode("utf-8") == message
+
+    payload = bytes(range(256)) * 1000
+    chunks = [payload[i:i + 777] for i in range(0, len(payload), 777)]
+    frames = list(hybrid_encrypt_stream(chunks, public_key, chunk_size=4096))
+    assert b"".join(hybrid_decrypt_stream(frames, crt_key)) == payload
+    assert b"".join(hybrid_decrypt_stream(list(hybrid_encrypt_stream([], public_key)), crt_key)) == b""
+
+    tampered = bytearray(b"".join(frames))
+    tampered[-20] ^= 1
+    with pytest.raises(ValueError):
+        b"".join(hybrid_decrypt_stream([bytes(tampered)], crt_key))
+    # dropping the final frame is detected
+    with pytest.raises(ValueError):
+        b"".join(hybrid_decrypt_stream(frames[:-1], crt_key))
+    # the OAEP-wrapped key is checked on unwrap
+    assert b"".join(hybrid_decrypt_stream(frames, private_key)) == payload
+    header = bytearray(frames[0])
+    header[10] ^= 1
+    with pytest.raises(ValueError):
+        b"".join(hybrid_decrypt_stream([bytes(header)] + frames[1:], private_key))
+    # encryption refuses frames that decryption would reject
+    with pytest.raises(ValueError):
+        hybrid_encrypt_stream(chunks, public_key, chunk_size=(1 << 24) + 1)
@@ -0,0 +1,59 @@
+import asyncio
+import hashlib
+import json
+
+from common import merkle
+from common.encrypted import ServerKey
+from common.merkle import ResponseSigner, verify_envelope
+
+
+def _server_signed(message: str, signature, server_key: dict) -> bool:
+    digest = int.from_bytes(hashlib.sha256(message.encode("utf-8")).digest(), "big")
+    return pow(int(signature), int(server_key["e"]), int(server_key["n"])) == digest
+
+
+def verify_response(envelope: dict, server_key: dict) -> bool:
+    """
+    Client-side check of a {message, signature} response, written from the
+    format alone (as client/js/security.js verifyResponse does), including
+    the Merkle mode where the signature covers "merkle-root:" + root.
+    """
+    proof = envelope.get("merkle")
+    if proof is None:
+        return _server_signed(envelope["message"], envelope["signature"], server_key)
+
+    node = hashlib.sha256(b"\x00" + envelope["message"].encode("utf-8")).digest()
+    for side, sibling in proof["proof"]:
+        sibling = bytes.fromhex(sibling)
+        pair = sibling + node if side == "L" else node + sibling
+        node = hashlib.sha256(b"\x01" + pair).digest()
+    if node.hex() != proof["root"]:
+        return False
+    return _server_signed("merkle-root:" + proof["root"], envelope["signature"], server_key)
+
+
+def test_batched_responses_verify_against_server_key(monkeypatch):
+    monkeypatch.setattr(merkle, "RESPONSE_SIGNING", "merkle")
+    ServerKey.load()
+    server_key = ServerKey.public()
+    messages = [json.dumps({"auction_id": i, "updated_price": 10.0 + i}) for i in range(7)]
+
+    async def sign_all():
+        return await asyncio.gather(*(ResponseSigner.sign(message) for message in messages))
+
+    envelopes = asyncio.run(sign_all())
+
+    # one window, one RSA signature over the root
+    assert len({envelope["merkle"]["root"] for envelope in envelopes}) == 1
+    for message, envelope in zip(messages, envelopes):
+        assert envelope["message"] == message
+        assert verify_response(envelope, server_key)
+        assert verify_envelope(envelope, server_key)
+
+    forged = dict(envelopes[3], message=messages[4])
+    assert not verify_response(forged, server_key)
+    assert not verify_envelope(forged, server_key)
+
+    monkeypatch.setattr(merkle, "RESPONSE_SIGNING", "rsa")
+    plain = asyncio.run(ResponseSigner.sign(messages[0]))
+    assert "merkle" not in plain and verify_response(plain, server_key)
@@ -0,0 +1,42 @@
+import pytest
+from fastapi import HTTPException
+
+from common import replay
+from common.replay import NonceStore
+
+
+@pytest.fixture(autouse=True)
+def store():
+    NonceStore.reset()
+    yield
+    NonceStore.reset()
+
+
+def _code(user_id, nonce, issued_at, now):
+    with pytest.raises(HTTPException) as error:
+        NonceStore.check(user_id, nonce, issued_at, now=now)
+    return error.value.detail["code"]
+
+
+def test_nonce_is_accepted_once_per_user():
+    NonceStore.check(1, "a", 1000, now=1000)
+    NonceStore.check(2, "a", 1000, now=1000)
+    assert _code(1, "a", 1000, now=1030) == 54
+
+
+def test_window_and_bulk_expiry():
+    window = replay.REPLAY_WINDOW_SECONDS
+    assert _code(1, "a", 1000 - window - 1, now=1000) == 53
+    assert _code(1, "", 1000, now=1000) == 52
+
+    NonceStore.check(1, "a", 1000, now=1000)
+    NonceStore.check(1, "b", 1000 + window, now=1000 + window)
+    NonceStore.check(1, "c", 1000 + 3 * window, now=1000 + 3 * window)
+    assert NonceStore._size == 1
+
+
+def test_store_is_bounded(monkeypatch):
+    monkeypatch.setattr(replay, "REPLAY_MAX_NONCES", 2)
+    NonceStore.check(1, "a", 1000, now=1000)
+    NonceStore.check(1, "b", 1000, now=1000)
+    assert _code(1, "c", 1000, now=1000) == 55
@@ -0,0 +1,346 @@
+import time
+import asyncio
+import sqlite3
+
+import pytest
+
+from common.database import Database
+from schemas.auction import CreateAuctionSchema, EditAuctionSchema
+from schemas.bids import CreateBidSchema
+from services.auction import Auction
+from services.bidbook import BidBook
+from services.bids import Bid
+from services.scheduler import CloseScheduler
+from services.users import Users
+
+
+# (caller, SQL) for every query on a request hot path
+HOT_QUERIES = [
+    ("Identity.resolve", "SELECT id, balance, public_key_e, public_key_n FROM UserInfo WHERE id = ?"),
+    ("Users.get", "SELECT * FROM UserInfo WHERE id = ?"),
+    ("Users.user_exists", "SELECT * FROM UserInfo WHERE username = ?"),
+    ("login", "SELECT id, password_hash FROM UserInfo WHERE username = ?"),
+    ("Auction.get", "SELECT * FROM Auctions WHERE id = ?"),
+    ("Users.get_user_balance", "SELECT balance FROM UserInfo WHERE id = ?"),
+    ("Auction.get_many", "SELECT * FROM Auctions WHERE id IN (SELECT value FROM json_each(?))"),
+    ("Auction.close_auctions (settlement)", Auction.SETTLEMENT_SQL),
+    ("CloseScheduler._reschedule_active",
+     "SELECT id, end_at, status FROM Auctions WHERE id IN (SELECT value FROM json_each(?))"),
+    ("BidBook.HIGHEST_SQL", BidBook.HIGHEST_SQL),
+    ("BidBook.LAST_SQL", BidBook.LAST_SQL),
+    ("Bid.get", "SELECT * FROM Bids WHERE id = ?"),
+    ("Bid.get_highest", "SELECT MAX(price) FROM Bids WHERE auction_id = ?"),
+    ("Bid.get_last_bid", "SELECT * FROM Bids WHERE auction_id = ? ORDER BY created_at DESC LIMIT 1"),
+    ("Bid.get_auction_bid_history",
+     "SELECT id, user_id, created_at, price FROM Bids WHERE auction_id = ? "
+     "ORDER BY created_at DESC, id DESC LIMIT ?"),
+    ("Bid.get_auction_bid_history (cursor)",
+     "SELECT id, user_id, created_at, price FROM Bids WHERE auction_id = ? AND (created_at, id) < (?, ?) "
+     "ORDER BY created_at DESC, id DESC LIMIT ?"),
+    ("Image.get_all_by_auction", "SELECT * FROM Images WHERE auction_id = ?"),
+    ("Auction.get_page", "SELECT * FROM Auctions ORDER BY end_at, id LIMIT ?"),
+    ("Auction.get_page (cursor)",
+     "SELECT * FROM Auctions WHERE (end_at, id) > (?, ?) ORDER BY end_at, id LIMIT ?"),
+    ("Auction.get_page (status, cursor)",
+     "SELECT * FROM Auctions WHERE status = ? AND (end_at, id) > (?, ?) ORDER BY end_at, id LIMIT ?"),
+]
+
+# Callers whose index walk has no residual filter: every row read is
+# returned, so LIMIT bounds the walk
+UNFILTERED_WALKS = {"Auction.get_page"}
+
+# Price-filtered catalog pages: base_price is filtered on the (end_at, id)
+# walk, so a selective range reads rows until the page fills. They must keep
+# the ordered walk (no sort) but are not constant-time.
+PRICE_FILTERED_PAGES = [
+    ("Auction.get_page (price)",
+     "SELECT * FROM Auctions WHERE base_price >= ? AND base_price <= ? ORDER BY end_at, id LIMIT ?"),
+    ("Auction.get_page (price, cursor)",
+     "SELECT * FROM Auctions WHERE base_price >= ? AND base_price <= ? AND (end_at, id) > (?, ?) "
+     "ORDER BY end_at, id LIMIT ?"),
+    ("Auction.get_page (status, price, cursor)",
+     "SELECT * FROM Auctions WHERE status = ? AND base_price >= ? AND (end_at, id) > (?, ?) "
+     "ORDER BY end_at, id LIMIT ?"),
+]
+
+
+@pytest.fixture(scope="module")
+def db():
+    conn = sqlite3.connect(":memory:")
+    with open("db_schemas.sql", "r", encoding="utf-8") as f:
+        conn.executescript(f.read())
+    yield conn
+    conn.close()
+
+
+def _plan(db, sql):
+    params = (None,) * sql.count("?")
+    return [row[3] for row in db.execute("EXPLAIN QUERY PLAN " + sql, params)]
+
+
+@pytest.mark.parametrize("caller,sql", HOT_QUERIES, ids=[q[0] for q in HOT_QUERIES])
+def test_hot_query_uses_an_index(db, caller, sql):
+    plan = _plan(db, sql)
+    assert plan, caller
+    for step in plan:
+        bounded_walk = caller in UNFILTERED_WALKS and "USING INDEX" in step
+        # json_each walks the id list bound as a parameter, not a table
+        id_list = step.startswith("SCAN json_each VIRTUAL TABLE")
+        assert not step.startswith("SCAN") or bounded_walk or id_list, f"{caller}: {step}"
+        assert "TEMP B-TREE" not in step, f"{caller}: {step}"
+
+
+@pytest.mark.parametrize("caller,sql", PRICE_FILTERED_PAGES, ids=[q[0] for q in PRICE_FILTERED_PAGES])
+def test_price_filtered_page_walks_end_index(db, caller, sql):
+    plan = _plan(db, sql)
+    assert len(plan) == 1, f"{caller}: {plan}"
+    index = plan[0].split(" (")[0]
+    assert index.endswith(("idx_auctions_end", "idx_auctions_status_end")), f"{caller}: {plan[0]}"
+    assert "TEMP B-TREE" not in plan[0], f"{caller}: {plan[0]}"
+
+
+@pytest.fixture
+def pool(tmp_path):
+    path = str(tmp_path / "test.db")
+    conn = sqlite3.connect(path)
+    with open("db_schemas.sql", "r", encoding="utf-8") as f:
+        conn.executescript(f.read())
+    conn.executemany(
+        "INSERT INTO UserInfo (username, password_hash, balance, created_at) VALUES (?, 'x', 1000, 0)",
+        [("seller",), ("alice",), ("bobby",)],
+    )
+    conn.commit()
+    conn.close()
+    return path
+
+
+def test_bidbook_matches_database(pool):
+    async def scenario():
+        await Database.open(pool, size=2)
+        try:
+            await BidBook.load()
+            auction = await Auction.create(
+                CreateAuctionSchema(seller_id=1, title="Lampe", description="une lampe", base_price=5, end_at=2**31)
+            )
+            bids = []
+            for user_id, price in ((2, 10), (3, 12), (2, 12), (3, 15)):
+                bids.append(await Bid.create(user_id, CreateBidSchema(auction_id=auction.id, price=price)))
+            assert BidBook.get(auction.id).highest_price == 15
+            assert await BidBook.check_consistency() == []
+
+            await Bid.delete(bids[-1].id)
+            entry = BidBook.get(auction.id)
+            assert (entry.highest_price, entry.highest_bid_id) == (12, bids[1].id)
+            assert entry.last_bid_id == bids[2].id
+            assert await BidBook.check_consistency() == []
+
+            await BidBook.load()
+            assert await BidBook.check_consistency() == []
+
+            await Auction.delete(auction.id)
+            assert BidBook.get(auction.id) is None
+            assert await BidBook.check_consistency() == []
+        finally:
+            await Database.close()
+
+    asyncio.run(scenario())
+
+
+def test_scheduler_closes_at_deadline(pool):
+    async def scenario():
+        await Database.open(pool, size=2)
+        await CloseScheduler.start(Auction.close_auctions)
+        try:
+            end_at = int(time.time()) + 1
+            auction = await Auction.create(
+                CreateAuctionSchema(seller_id=1, title="Lampe", description="une lampe", base_price=5, end_at=end_at)
+            )
+            await Bid.create(2, CreateBidSchema(auction_id=auction.id, price=30))
+
+            await asyncio.sleep(end_at - time.time() + 0.2)
+            assert (await Auction.get(auction.id)).status == "INACTIVE"
+            assert await Users.get_user_balance(1) == 1030
+            assert await Users.get_user_balance(2) == 970
+
+            # settlement is idempotent
+            assert await Auction.close_auctions([auction.id]) == []
+            assert await Auction.close_auctions() == []
+            assert await Users.get_user_balance(1) == 1030
+            assert await Users.get_user_balance(2) == 970
+        finally:
+            await CloseScheduler.stop()
+            await Database.close()
+
+    asyncio.run(scenario())
+
+
+def test_search_index_follows_auctions(pool):
+    async def scenario():
+        await Database.open(pool, size=2)
+        try:
+            auction = await Auction.create(
+                CreateAuctionSchema(seller_id=1, title="Lampe", description="lampe de bureau", base_price=5, end_at=2**31)
+            )
+            assert [a.id for a in await Auction.search("bureau", 10)] == [auction.id]
+
+            await Auction.edit(EditAuctionSchema(
+                id=auction.id, title="Chaise", description="chaise en bois",
+                base_price=5, end_at=2**31, status="ACTIVE",
+            ))
+            assert await Auction.search("bureau", 10) == []
+            assert [a.id for a in await Auction.search("boi", 10)] == [auction.id]
+
+            await Auction.delete(auction.id)
+            assert await Auction.search("chaise", 10) == []
+        finally:
+            await Database.close()
+
+    asyncio.run(scenario())
+
+
+def test_hot_auction_orders_concurrent_bidders(pool):
+    from services.bidactor import BidActors, BidRejected
+
+    async def scenario():
+        await Database.open(pool, size=4)
+        try:
+            await BidBook.load()
+            auction = await Auction.create(
+                CreateAuctionSchema(seller_id=1, title="Lampe", description="une lampe", base_price=5, end_at=2**31)
+            )
+            # 1,000 bidders at once, prices shuffled so many arrive too low
+            prices = [float(10 + (i * 7919) % 1000) for i in range(1000)]
+            futures = [BidActors.submit(auction.id, 2 + i % 2, price) for i, price in enumerate(prices)]
+            outcomes = await asyncio.gather(*futures, return_exceptions=True)
+
+            accepted = [o for o in outcomes if not isinstance(o, BidRejected)]
+            assert all(isinstance(o, BidRejected) and o.code == 58 for o in outcomes if o not in accepted)
+            # in arrival order, exactly the running maxima were accepted
+            highest, expected = None, []
+            for price in prices:
+                if highest is None or price > highest:
+                    highest = price
+                    expected.append(price)
+            assert [bid.price for bid in accepted] == expected
+            assert [bid.id for bid in accepted] == sorted(bid.id for bid in accepted)
+            assert BidBook.get(auction.id).highest_price == max(prices)
+            assert await BidBook.check_consistency() == []
+        finally:
+            await BidActors.stop()
+            await Database.close()
+
+    asyncio.run(scenario())
+
+
+
+def test_cancelled_bid_does_not_stop_actor(pool):
+    from services.bidactor import BidActors, BidRejected
+
+    async def scenario():
+        await Database.open(pool, size=2)
+        try:
+            await BidBook.load()
+            auction = await Auction.create(
+                CreateAuctionSchema(seller_id=1, title="Lampe", description="une lampe", base_price=5, end_at=2**31)
+            )
+            await BidActors.submit(auction.id, 2, 20.0)
+            # a client gone while its (too low) bid is still queued
+            BidActors.submit(auction.id, 3, 10.0).cancel()
+            bid = await asyncio.wait_for(BidActors.submit(auction.id, 3, 30.0), timeout=2)
+            assert bid.price == 30.0
+            with pytest.raises(BidRejected):
+                await asyncio.wait_for(BidActors.submit(auction.id, 2, 25.0), timeout=2)
+        finally:
+            await BidActors.stop()
+            await Database.close()
+
+    asyncio.run(scenario())
+
+def test_bid_history_chunks_newest_first(pool):
+    async def scenario():
+        await Database.open(pool, size=2)
+        try:
+            await BidBook.load()
+            auction = await Auction.create(
+                CreateAuctionSchema(seller_id=1, title="Lampe", description="une lampe", base_price=5, end_at=2**31)
+            )
+            # one batch: every bid shares created_at, so only the id orders them
+            bids = await Bid.create_many(
+                [(2 + i % 2, CreateBidSchema(auction_id=auction.id, price=10 + i)) for i in range(7)]
+            )
+
+            chunks = [chunk async for chunk in Bid.get_auction_bid_history(auction.id, True, chunk_size=3)]
+            assert [len(chunk) for chunk in chunks] == [3, 3, 1]
+            history = [bid for chunk in chunks for bid in chunk]
+            assert [bid["id"] for bid in history] == [bid.id for bid in reversed(bids)]
+            assert {bid["user_id"] for bid in history} == {None}
+
+            chunks = [chunk async for chunk in Bid.get_auction_bid_history(auction.id, False, chunk_size=7)]
+            assert [len(chunk) for chunk in chunks] == [7]
+            assert [bid["user_id"] for bid in chunks[0]] == [2 + i % 2 for i in reversed(range(7))]
+        finally:
+            await Database.close()
+
+    asyncio.run(scenario())
+
+
+def test_scheduler_reschedules_unsettled(pool):
+    calls = []
+
+    async def flaky_close(auction_ids):
+        # the first pass settles nothing, as if the deadline were not reached yet
+        calls.append(auction_ids)
+        if len(calls) == 1:
+            return []
+        return await Auction.close_auctions(auction_ids)
+
+    async def scenario():
+        await Database.open(pool, size=2)
+        await CloseScheduler.start(flaky_close)
+        try:
+            end_at = int(time.time()) + 1
+            auction = await Auction.create(
+                CreateAuctionSchema(seller_id=1, title="Lampe", description="une lampe", base_price=5, end_at=end_at)
+            )
+            await asyncio.sleep(end_at - time.time() + 1.5)
+            assert calls == [[auction.id], [auction.id]]
+            assert (await Auction.get(auction.id)).status == "INACTIVE"
+        finally:
+            await CloseScheduler.stop()
+            await Database.close()
+
+    asyncio.run(scenario())
+
+
+def test_shutdown_writes_queued_bids(pool):
+    from services.bidactor import BidActors
+    from services.bids import BidWriter
+
+    async def scenario():
+        await Database.open(pool, size=2)
+        try:
+            await BidBook.load()
+            auction = await Auction.create(
+                CreateAuctionSchema(seller_id=1, title="Lampe", description="une lampe", base_price=5, end_at=2**31)
+            )
+            futures = [BidActors.submit(auction.id, 2, float(10 + i)) for i in range(20)]
+            # nothing has run yet: every bid is still queued in the actor
+            await BidActors.stop()
+            await BidWriter.stop()
+            assert all(future.done() and not future.exception() for future in futures)
+
+            async with Database.connection() as db:
+                cursor = await db.execute("SELECT COUNT(*) FROM Bids WHERE auction_id = ?", (auction.id,))
+                assert (await cursor.fetchone())[0] == 20
+        finally:
+            await Database.close()
+
+    asyncio.run(scenario())
+
+
+def test_public_key_cache_follows_row():
+    Users._public_keys.clear()
+    old = Users.parse_public_key("3", "33")
+    assert Users.parse_public_key("3", "33") is old
+    # a login replaced the key: the fresh row wins over the cached entry
+    assert Users.parse_public_key("65537", "77") == {"e": 65537, "n": 77}